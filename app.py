@@ -1,12 +1,28 @@
 import gradio as gr
-import requests
-import base64
+import httpx
+import asyncio
+import json
+import os
 import time
-import re
+from pathlib import Path
+
+from career_advisor.advice_schema import advice_from_dict
+from career_advisor.cache import LRUCache, advice_cache_key, file_sha256
+from career_advisor.metrics import abandoned_work, start_metrics_server
+from career_advisor.resume import is_parse_error, parse_resume_file, process_pool
+from career_advisor.resilience import RETRY_STATUSES, CircuitBreaker, backoff_delay
+from career_advisor.render import format_advice, format_outputs
+from career_advisor.sections import SECTION_KEYS, SectionParser, extract_sections
+from career_advisor.singleflight import AsyncSingleFlight
+from career_advisor.timing import StageTimer
 
 # --- IMPORTANT ---
-# Paste the web endpoint URL you got from deploying the Modal app here.
-MODAL_WEB_ENDPOINT_URL = "https://aryanjathar0723--career-advisor-agent-gemini-web-endpoint.modal.run"
+# Paste the web endpoint URL you got from deploying the Modal app here
+# (or set MODAL_WEB_ENDPOINT_URL in the environment).
+MODAL_WEB_ENDPOINT_URL = os.environ.get(
+    "MODAL_WEB_ENDPOINT_URL",
+    "https://aryanjathar0723--career-advisor-agent-gemini-web-endpoint.modal.run",
+)
 
 if MODAL_WEB_ENDPOINT_URL.startswith("https://your-org"):
     print("="*80)
@@ -14,753 +30,349 @@ if MODAL_WEB_ENDPOINT_URL.startswith("https://your-org"):
     print("!!! Please deploy the modal_agent.py script and paste the URL in app.py.  !!!")
     print("="*80)
 
-def extract_sections(markdown_text):
-    """Extract different sections from the markdown response"""
-    sections = {
-        'summary': '',
-        'roles': '',
-        'skills': '',
-        'learning': '',
-        'projects': '',
-        'certifications': ''
-    }
-    
-    current_section = None
-    current_content = []
-    
-    for line in markdown_text.split('\n'):
-        if line.startswith('### 💫'):
-            current_section = 'summary'
-            current_content = []
-        elif line.startswith('### 🎯'):
-            current_section = 'roles'
-            current_content = []
-        elif line.startswith('### 📊'):
-            current_section = 'skills'
-            current_content = []
-        elif line.startswith('### 📚'):
-            current_section = 'learning'
-            current_content = []
-        elif line.startswith('### 💡'):
-            current_section = 'projects'
-            current_content = []
-        elif line.startswith('### 🎓'):
-            current_section = 'certifications'
-            current_content = []
-        # Skip roadmap section
-        elif line.startswith('### 🗺️'):
-            current_section = None
-            current_content = []
-        elif current_section:
-            current_content.append(line)
-            sections[current_section] = '\n'.join(current_content)
-    
+# Card styles and the expand/collapse script, sent once with the page
+STATIC_DIR = Path(__file__).parent / "static"
+ADVISOR_CSS_PATH = STATIC_DIR / "advisor.css"
+ADVISOR_HEAD_PATH = STATIC_DIR / "advisor_head.html"
+
+# Queue settings: how many advice requests run at once and how many may wait
+CONCURRENCY_LIMIT = int(os.environ.get("ADVISOR_CONCURRENCY_LIMIT", 200))
+QUEUE_MAX_SIZE = int(os.environ.get("ADVISOR_QUEUE_MAX_SIZE", 1000))
+DEFAULT_CONCURRENCY_LIMIT = int(os.environ.get("ADVISOR_DEFAULT_CONCURRENCY_LIMIT", 1))
+
+# Connection pool and retry settings for calls to the Modal endpoint
+HTTP_POOL_SIZE = int(os.environ.get("ADVISOR_HTTP_POOL_SIZE", CONCURRENCY_LIMIT))
+CONNECT_TIMEOUT = float(os.environ.get("ADVISOR_CONNECT_TIMEOUT", 5))
+# Longest wait between two chunks of the streamed advice
+READ_TIMEOUT = float(os.environ.get("ADVISOR_READ_TIMEOUT", 60))
+MAX_RETRIES = int(os.environ.get("ADVISOR_MAX_RETRIES", 2))
+# Time a request may take end to end; the endpoint is told what is left so it
+# stops generating once nobody will read the result
+REQUEST_DEADLINE = float(os.environ.get("ADVISOR_REQUEST_DEADLINE", 120))
+DEADLINE_HEADER = "X-Advisor-Timeout"
+# Sent by the endpoint with value "sections" when each streamed chunk ends a section
+CHUNKS_HEADER = "X-Advisor-Chunks"
+# Largest resume we upload; must not exceed the endpoint's ADVISOR_MAX_UPLOAD_BYTES
+MAX_UPLOAD_BYTES = int(os.environ.get("ADVISOR_MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+# "single" or "fanout" (one concurrent generation per section); unset uses the endpoint's default
+GENERATION_MODE = os.environ.get("ADVISOR_GENERATION_MODE")
+# "json" asks for structured advice rendered without parsing Markdown; unset uses the endpoint's default
+OUTPUT_FORMAT = os.environ.get("ADVISOR_OUTPUT_FORMAT")
+# Port for the Prometheus /metrics endpoint with per-stage latency histograms; unset disables it
+METRICS_PORT = int(os.environ.get("ADVISOR_METRICS_PORT", 0))
+
+# One keep-alive connection pool shared by every request on the event loop
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE),
+    timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+)
+
+# Extract resume text in this process's worker pool and send only the text,
+# instead of uploading the file for the Modal endpoint to parse
+LOCAL_RESUME_PARSING = os.environ.get("ADVISOR_LOCAL_RESUME_PARSING", "1") == "1"
+RESUME_PARSE_WORKERS = int(os.environ.get("ADVISOR_RESUME_PARSE_WORKERS", 2))
+resume_parse_pool = process_pool(RESUME_PARSE_WORKERS) if LOCAL_RESUME_PARSING else None
+# Locally extracted resume text keyed by the SHA-256 of the file, so re-submissions skip the parse
+parsed_resumes = LRUCache(max_entries=256, max_bytes=int(os.environ.get("ADVISOR_RESUME_CACHE_MAX_BYTES", 32 * 1024 * 1024)))
+
+# Fail fast instead of holding workers on a backend that keeps failing
+endpoint_breaker = CircuitBreaker(
+    failure_threshold=int(os.environ.get("ADVISOR_BREAKER_THRESHOLD", 5)),
+    reset_timeout=float(os.environ.get("ADVISOR_BREAKER_RESET", 30)),
+)
+
+THINKING_MESSAGE = "🤔 Agent is thinking... Parsing your profile and crafting a response. This may take a moment."
+
+def placeholder_sections(summary, other=""):
+    """Sections showing a message in the summary tab and other in the rest."""
+    sections = dict.fromkeys(SECTION_KEYS, other)
+    sections["summary"] = summary
     return sections
 
-def format_skill_bars(text):
-    """Convert skill meter text to HTML progress bars"""
-    formatted = []
-    in_skill_meter = False
-    for line in text.split('\n'):
-        if '```skill-meter' in line:
-            in_skill_meter = True
-            formatted.append('<div class="skill-bars">')
-            continue
-        elif '```' in line and in_skill_meter:
-            in_skill_meter = False
-            formatted.append('</div>')
-            continue
-        
-        if in_skill_meter and '[' in line and ']' in line:
-            try:
-                skill_name, rest = line.split('[')
-                percentage = re.search(r'(\d+)%', rest)
-                if percentage:
-                    pct = int(percentage.group(1))
-                    formatted.append(f'''
-                    <div class="skill-bar">
-                        <div class="skill-name">{skill_name.strip()}</div>
-                        <div class="progress-bar">
-                            <div class="progress" style="width: {pct}%; background-color: #3498db;"></div>
-                        </div>
-                        <div class="percentage">{pct}%</div>
-                    </div>
-                    ''')
-            except:
-                formatted.append(line)
+# Outputs that never change, rendered once
+MISSING_INPUT_OUTPUTS = format_outputs(placeholder_sections("Please provide your bio/goals and select an interest area."))
+THINKING_OUTPUTS = format_outputs(placeholder_sections(THINKING_MESSAGE))
+
+class RequestStats:
+    """In-flight advice requests and a moving average of how long they take."""
+
+    def __init__(self, smoothing=0.2):
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.average_seconds = None
+
+    def start(self):
+        self.in_flight += 1
+        return time.monotonic()
+
+    def finish(self, started):
+        self.in_flight -= 1
+        elapsed = time.monotonic() - started
+        if self.average_seconds is None:
+            self.average_seconds = elapsed
         else:
-            formatted.append(line)
-    
-    return '\n'.join(formatted)
-
-def format_project_cards(text):
-    """Convert project-card text to HTML cards"""
-    formatted = []
-    in_project_card = False
-    current_card = {}
-    
-    for line in text.split('\n'):
-        if '```project-card' in line:
-            in_project_card = True
-            current_card = {}
-            continue
-        elif '```' in line and in_project_card:
-            in_project_card = False
-            if current_card:
-                card_html = f'''
-                <div class="project-card">
-                    <div>{current_card.get('project', 'Project')}</div>
-                    <div><strong>Difficulty:</strong> {current_card.get('difficulty', '⭐⭐⭐')}</div>
-                    <div><strong>Duration:</strong> {current_card.get('duration', '2 weeks')}</div>
-                    <div><strong>Skills:</strong> {current_card.get('skills', 'Various skills')}</div>
-                    <div><strong>Description:</strong> {current_card.get('description', 'Project description')}</div>
-                </div>
-                '''
-                formatted.append(card_html)
-            continue
-        
-        if in_project_card:
-            line = line.strip()
-            if line.startswith('Project:'):
-                current_card['project'] = line[len('Project:'):].strip()
-            elif line.startswith('Difficulty:'):
-                current_card['difficulty'] = line[len('Difficulty:'):].strip()
-            elif line.startswith('Duration:'):
-                current_card['duration'] = line[len('Duration:'):].strip()
-            elif line.startswith('Skills:'):
-                current_card['skills'] = line[len('Skills:'):].strip()
-            elif line.startswith('Description:'):
-                current_card['description'] = line[len('Description:'):].strip()
+            self.average_seconds += self.smoothing * (elapsed - self.average_seconds)
+        return elapsed
+
+    def status(self, started):
+        """Status line shown under the button while a request is running."""
+        elapsed = time.monotonic() - started
+        status = f"⏳ Working for {elapsed:.0f}s · {self.in_flight} request(s) in progress"
+        if self.average_seconds is not None:
+            remaining = max(0.0, self.average_seconds - elapsed)
+            status += f" · about {remaining:.0f}s left"
+        return status
+
+request_stats = RequestStats()
+
+def time_left(deadline):
+    """Seconds until deadline (a time.monotonic() value); raises asyncio.TimeoutError once it has passed."""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise asyncio.TimeoutError("the request took too long")
+    return remaining
+
+async def open_advice_stream(deadline, **request_kwargs):
+    """
+    POSTs to the Modal endpoint (request_kwargs are passed to httpx) and
+    returns the streaming response once its headers arrive. Connection
+    errors, 429s and 5xx are retried with jittered backoff until deadline;
+    the time left is sent in the DEADLINE_HEADER. The caller must close the
+    response.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        headers = {DEADLINE_HEADER: f"{time_left(deadline):.1f}"}
+        endpoint_breaker.before_call()
+        retry_after = None
+        try:
+            request = http_client.build_request("POST", MODAL_WEB_ENDPOINT_URL, headers=headers, **request_kwargs)
+            response = await http_client.send(request, stream=True)
+        except httpx.TransportError as e:
+            endpoint_breaker.record_failure()
+            if attempt == MAX_RETRIES:
+                raise
+            print(f"Request to Modal endpoint failed ({e!r}), retrying...")
+        except BaseException:
+            # Cancelled (Stop, a closed tab) or failed otherwise: neither outcome
+            # says anything about the backend, but a half-open trial must end
+            endpoint_breaker.abandon_trial()
+            raise
         else:
-            formatted.append(line)
-    
-    return '\n'.join(formatted)
-
-def format_roles(content):
-    """Format roles as cards"""
-    formatted_content = []
-    current_role = []
-    in_role = False
-    
-    for line in content.split('\n'):
-        if line.strip().startswith('1.') or line.strip().startswith('2.') or line.strip().startswith('3.'):
-            if in_role:
-                formatted_content.append(format_role_card(current_role))
-            in_role = True
-            current_role = [line]
-        elif in_role and line.strip():
-            current_role.append(line)
-    
-    if current_role:
-        formatted_content.append(format_role_card(current_role))
-    
-    return '\n'.join(formatted_content)
-
-def format_role_card(role_lines):
-    """Helper function to format role card"""
-    role_title = role_lines[0].strip()
-    # Extract role name and match score
-    role_name = ""
-    match_score = ""
-    if "**" in role_title:
-        parts = role_title.split("**")
-        if len(parts) > 1:
-            role_name = parts[1].strip()
-            if "(Match Score:" in role_title:
-                match_parts = role_title.split("(Match Score:")
-                if len(match_parts) > 1:
-                    match_score = match_parts[1].split(")")[0].strip()
-    
-    card_html = f'''
-    <div class="role-card">
-        <div class="role-title">{role_name} (Match Score: {match_score})</div>
-    '''
-    
-    for line in role_lines[1:]:
-        line = line.strip()
-        if line.startswith('-'):
-            detail = line[1:].strip()
-            if "Salary Range:" in detail:
-                card_html += f'<div class="role-detail"><strong>Salary Range:</strong> {detail.split("Salary Range:")[1].strip()}</div>'
-            elif "Key Requirements:" in detail:
-                card_html += f'<div class="role-detail"><strong>Key Requirements:</strong> {detail.split("Key Requirements:")[1].strip()}</div>'
-            elif "Why It Fits:" in detail:
-                card_html += f'<div class="role-detail"><strong>Why It Fits:</strong> {detail.split("Why It Fits:")[1].strip()}</div>'
-            else:
-                card_html += f'<div class="role-detail">{detail}</div>'
-    
-    card_html += '</div>'
-    return card_html
-
-def format_certification_card(cert_lines):
-    """Helper function to format certification card"""
-    cert_name = cert_lines[0].replace('*', '').strip()
-    card_html = f'''
-    <div class="cert-card">
-        <div class="cert-name">{cert_name}</div>
-    '''
-    
-    for line in cert_lines[1:]:
-        if line.strip():
-            line = line.strip().strip('*').strip('-').strip()
-            if "difficulty level:" in line.lower():
-                stars = line.split(":", 1)[1].strip() if ":" in line else ""
-                card_html += f'<div class="cert-detail">- Difficulty Level: {stars}</div>'
-            elif "time commitment:" in line.lower():
-                time = line.split(":", 1)[1].strip() if ":" in line else ""
-                card_html += f'<div class="cert-detail">- Time Commitment: {time}</div>'
-            elif "cost range:" in line.lower():
-                cost = line.split(":", 1)[1].strip() if ":" in line else ""
-                card_html += f'<div class="cert-detail">- Cost Range: {cost}</div>'
+            if response.is_error:
+                print(f"Response status code: {response.status_code}")
+            if response.status_code not in RETRY_STATUSES:
+                endpoint_breaker.record_success()
+                if response.is_error:
+                    await response.aclose()
+                    response.raise_for_status()
+                return response
+            await response.aclose()
+            # A rate limit means the backend is up, so only 5xx count against the breaker
+            if response.status_code == 429:
+                endpoint_breaker.record_success()
             else:
-                card_html += f'<div class="cert-detail">• {line}</div>'
-    
-    card_html += '</div>'
-    return card_html
-
-def parse_certifications(content):
-    """Parse certification content to group details by certification"""
-    lines = content.split('\n')
-    cert_groups = []
-    current_cert = []
-    
-    # Check if content follows the format from the screenshot with dashes
-    has_cert_headers = any(line.strip().startswith('- ') for line in lines)
-    
-    if has_cert_headers:
-        cert_name = ""
-        cert_details = []
-        
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line:
-                continue
-                
-            if line.startswith('- ') and not any(detail in line.lower() for detail in ['difficulty level', 'time commitment', 'cost range']):
-                # This is a new certificate name
-                if cert_name:
-                    # Save the previous certificate
-                    cert_groups.append([f"* {cert_name}"] + cert_details)
-                
-                cert_name = line[2:].strip()
-                cert_details = []
-            elif line.startswith('- '):
-                # This is a detail for the current certificate
-                cert_details.append(line)
-        
-        # Add the last certificate
-        if cert_name:
-            cert_groups.append([f"* {cert_name}"] + cert_details)
-    else:
-        # Fall back to original parsing
-        in_cert = False
-        for line in lines:
-            if line.strip().startswith('*'):
-                if in_cert and current_cert:
-                    cert_groups.append(current_cert)
-                in_cert = True
-                current_cert = [line]
-            elif in_cert and line.strip():
-                current_cert.append(line)
-        
-        if current_cert:
-            cert_groups.append(current_cert)
-    
-    return cert_groups
-
-def format_sections(sections):
-    """Format all sections with proper styling"""
-    css = """
-    <style>
-    :root {
-        --bg-color: #1a1b26;
-        --text-color: #a9b1d6;
-        --heading-color: #7aa2f7;
-        --card-bg: #24283b;
-        --card-border: #414868;
-        --highlight: #bb9af7;
-        --progress-bg: #414868;
-        --progress-fill: linear-gradient(90deg, #7aa2f7, #bb9af7);
-        --card-hover: #2f3549;
-    }
-
-    body {
-        font-size: 16px;
-        line-height: 1.6;
-        background-color: var(--bg-color);
-        color: var(--text-color);
-    }
-
-    .skill-bars {
-        font-family: monospace;
-        margin: 25px 0;
-        font-size: 1.1em;
-        background-color: var(--card-bg);
-        padding: 20px;
-        border-radius: 12px;
-        border: 1px solid var(--card-border);
-    }
-
-    .skill-bar {
-        display: flex;
-        align-items: center;
-        margin: 15px 0;
-        gap: 15px;
-    }
-
-    .skill-name {
-        width: 180px;
-        text-align: right;
-        font-size: 1.1em;
-        color: var(--heading-color);
-    }
-
-    .progress-bar {
-        flex-grow: 1;
-        height: 25px;
-        background-color: var(--progress-bg);
-        border-radius: 12px;
-        overflow: hidden;
-        box-shadow: inset 0 1px 3px rgba(0,0,0,0.2);
-    }
-
-    .progress {
-        height: 100%;
-        border-radius: 12px;
-        transition: width 0.5s ease-in-out;
-        background: var(--progress-fill);
-    }
-
-    .percentage {
-        width: 60px;
-        font-size: 1.1em;
-        font-weight: 500;
-        color: var(--text-color);
-    }
-
-    .project-card {
-        border: 1px solid var(--card-border);
-        padding: 25px;
-        margin: 20px 0;
-        border-radius: 12px;
-        background-color: var(--card-bg);
-        box-shadow: 0 4px 6px rgba(0,0,0,0.2);
-        font-size: 1.1em;
-        transition: transform 0.2s ease, box-shadow 0.2s ease;
-    }
-
-    .project-card:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 12px rgba(0,0,0,0.3);
-    }
-
-    .project-card div {
-        margin: 10px 0;
-        line-height: 1.6;
-    }
-
-    .project-card strong {
-        color: var(--heading-color);
-        margin-right: 10px;
-        font-weight: 600;
-    }
-
-    .project-card div:first-child {
-        font-size: 1.2em;
-        color: var(--highlight);
-        margin-bottom: 15px;
-        font-weight: 500;
-    }
-
-    h3 {
-        font-size: 1.5em;
-        margin: 1.5em 0 1em;
-        color: var(--heading-color);
-        border-bottom: 2px solid var(--card-border);
-        padding-bottom: 0.5em;
-    }
-
-    p {
-        font-size: 1.1em;
-        line-height: 1.6;
-        color: var(--text-color);
-        margin: 1em 0;
-    }
-
-    ul, ol {
-        font-size: 1.1em;
-        line-height: 1.6;
-        padding-left: 1.5em;
-        margin: 1em 0;
-    }
-
-    li {
-        margin: 0.8em 0;
-        padding-left: 0.5em;
-    }
-
-    strong {
-        color: var(--highlight);
-    }
-
-    .role-card {
-        background-color: var(--card-bg);
-        border: 1px solid var(--card-border);
-        border-radius: 12px;
-        padding: 20px;
-        margin: 15px 0;
-    }
-
-    .role-title {
-        color: var(--highlight);
-        font-size: 1.2em;
-        margin-bottom: 10px;
-    }
-
-    .role-detail {
-        margin: 8px 0;
-        color: var(--text-color);
-    }
-
-    .bullet-point {
-        margin: 10px 0;
-        padding-left: 20px;
-        position: relative;
-        color: var(--text-color);
-    }
-
-    .bullet-point:before {
-        content: "•";
-        color: var(--highlight);
-        position: absolute;
-        left: 0;
-        font-size: 1.2em;
-    }
-
-    .content-line {
-        margin: 10px 0;
-        padding: 5px 0;
-        color: var(--text-color);
-    }
-
-    .content-line strong {
-        color: var(--highlight);
-        font-weight: 600;
-    }
-
-    .expandable-card {
-        border: 1px solid var(--card-border);
-        border-radius: 12px;
-        background-color: var(--card-bg);
-        margin: 15px 0;
-        overflow: hidden;
-        transition: all 0.3s ease;
-    }
-
-    .expandable-card .card-header {
-        padding: 15px 20px;
-        cursor: pointer;
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-        border-bottom: 1px solid var(--card-border);
-    }
-
-    .expandable-card .card-header:hover {
-        background-color: var(--card-hover);
-    }
-
-    .expandable-card .card-title {
-        color: var(--highlight);
-        font-size: 1.2em;
-        font-weight: 500;
-    }
-
-    .expandable-card .card-content {
-        padding: 20px;
-        display: none;
-    }
-
-    .expandable-card.expanded .card-content {
-        display: block;
-    }
-
-    .learning-card {
-        border: 1px solid var(--card-border);
-        border-radius: 12px;
-        background-color: var(--card-bg);
-        padding: 20px;
-        margin: 15px 0;
-        transition: transform 0.2s ease, box-shadow 0.2s ease;
-    }
-
-    .learning-card:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 12px rgba(0,0,0,0.3);
-    }
-
-    .learning-card .month-range {
-        color: var(--highlight);
-        font-size: 1.2em;
-        margin-bottom: 10px;
-        font-weight: 500;
-    }
-
-    .learning-card .course-name {
-        color: var(--heading-color);
-        margin: 10px 0;
-    }
-
-    .learning-card .project-name {
-        color: var(--text-color);
-        margin: 10px 0;
-    }
-
-    .learning-card .outcome {
-        color: var(--text-color);
-        font-style: italic;
-        margin-top: 10px;
-        padding-top: 10px;
-        border-top: 1px solid var(--card-border);
-    }
-
-    .cert-card {
-        border: 1px solid var(--card-border);
-        border-radius: 12px;
-        background-color: var(--card-bg);
-        padding: 20px;
-        margin: 15px 0;
-        transition: transform 0.2s ease, box-shadow 0.2s ease;
-    }
-
-    .cert-card:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 12px rgba(0,0,0,0.3);
-    }
-
-    .cert-card .cert-name {
-        color: var(--highlight);
-        font-size: 1.2em;
-        margin-bottom: 10px;
-        font-weight: 500;
-    }
-
-    .cert-card .cert-detail {
-        color: var(--text-color);
-        margin: 8px 0;
-    }
-    </style>
-
-    <script>
-    document.addEventListener('DOMContentLoaded', function() {
-        document.querySelectorAll('.expandable-card .card-header').forEach(header => {
-            header.addEventListener('click', () => {
-                const card = header.parentElement;
-                card.classList.toggle('expanded');
-            });
-        });
-    });
-    </script>
+                endpoint_breaker.record_failure()
+            if attempt == MAX_RETRIES:
+                response.raise_for_status()
+            retry_after = response.headers.get("retry-after")
+        await asyncio.sleep(min(backoff_delay(attempt, retry_after=retry_after), time_left(deadline)))
+
+async def parse_resume_locally(path):
+    """
+    Extracts the resume text in the local process pool. Returns None when that
+    fails, so the file is uploaded and parsed by the Modal endpoint instead.
     """
-    
-    formatted = {}
-    for key, content in sections.items():
-        if key == 'skills':
-            formatted[key] = css + format_skill_bars(content)
-        elif key == 'summary':
-            # Format summary as an expandable card
-            lines = content.split('\n')
-            formatted_content = ['<div class="expandable-card expanded">']
-            formatted_content.append('<div class="card-header">')
-            formatted_content.append('<div class="card-title">Quick Summary</div>')
-            formatted_content.append('<div class="expand-icon">▼</div>')
-            formatted_content.append('</div>')
-            formatted_content.append('<div class="card-content">')
-            for line in lines:
-                if line.strip():
-                    formatted_content.append(f'<div class="content-line">{line}</div>')
-            formatted_content.append('</div>')
-            formatted_content.append('</div>')
-            formatted[key] = '\n'.join(formatted_content)
-        elif key == 'roles':
-            # Format roles as cards
-            formatted[key] = css + format_roles(content)
-        elif key == 'projects':
-            # Format projects as cards
-            formatted[key] = css + format_project_cards(content)
-        elif key == 'learning':
-            # Format learning path as cards
-            formatted_content = []
-            current_month = []
-            in_month = False
-            
-            for line in content.split('\n'):
-                if line.strip().startswith('1.') or line.strip().startswith('2.') or line.strip().startswith('3.'):
-                    if in_month:
-                        card_content = '\n'.join(current_month)
-                        month_range = current_month[0].split(':')[0].replace('*', '').strip()
-                        card_html = f'''
-                        <div class="learning-card">
-                            <div class="month-range">{month_range}</div>
-                            {format_learning_content(card_content)}
-                        </div>
-                        '''
-                        formatted_content.append(card_html)
-                    in_month = True
-                    current_month = [line]
-                elif in_month:
-                    current_month.append(line)
-            
-            if current_month:
-                card_content = '\n'.join(current_month)
-                month_range = current_month[0].split(':')[0].replace('*', '').strip()
-                card_html = f'''
-                <div class="learning-card">
-                    <div class="month-range">{month_range}</div>
-                    {format_learning_content(card_content)}
-                </div>
-                '''
-                formatted_content.append(card_html)
-            
-            formatted[key] = css + '\n'.join(formatted_content)
-        elif key == 'certifications':
-            # Format certifications as cards
-            formatted_content = []
-            
-            # Parse certifications into groups
-            cert_groups = parse_certifications(content)
-            
-            for cert_group in cert_groups:
-                formatted_content.append(format_certification_card(cert_group))
-            
-            if not formatted_content:
-                # If no certifications were found, add a placeholder
-                formatted_content.append('<div class="cert-card"><div class="cert-name">No certifications found</div></div>')
-            
-            formatted[key] = css + '\n'.join(formatted_content)
+    try:
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(resume_parse_pool, parse_resume_file, path)
+    except Exception as e:
+        print(f"Local resume parsing failed, uploading the file instead: {e}")
+        return None
+    if is_parse_error(text):
+        print(f"Local resume parsing failed, uploading the file instead: {text}")
+        return None
+    return text
+
+async def upload_resume(fields, path, deadline):
+    """Sends the request with the resume as a multipart file part, streamed from disk."""
+    if os.path.getsize(path) > MAX_UPLOAD_BYTES:
+        raise ValueError(f"Resume is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+    with open(path, "rb") as f:
+        return await open_advice_stream(
+            deadline,
+            data={key: str(value).lower() if isinstance(value, bool) else value for key, value in fields.items()},
+            files={"resume": (os.path.basename(path), f)},
+        )
+
+async def request_advice(bio, interest, resume_file, resume_hash, deadline, timer):
+    """
+    Opens the advice stream, sending the resume in the cheapest form available:
+    locally extracted text, or its SHA-256 (the endpoint keeps parsed resumes)
+    followed by the file itself only if the endpoint has not seen it.
+    Each step is recorded on timer.
+    """
+    fields = {"bio": bio, "interest": interest, "stream": True}
+    if GENERATION_MODE:
+        fields["mode"] = GENERATION_MODE
+    if OUTPUT_FORMAT:
+        fields["format"] = OUTPUT_FORMAT
+    if resume_file is None:
+        with timer.stage("request"):
+            return await open_advice_stream(deadline, json=fields)
+
+    if resume_parse_pool is not None:
+        resume_text = parsed_resumes.get(resume_hash)
+        if resume_text is None:
+            with timer.stage("resume_parse"):
+                resume_text = await parse_resume_locally(resume_file.name)
+            if resume_text is not None:
+                parsed_resumes.set(resume_hash, resume_text)
+        if resume_text is not None:
+            with timer.stage("request"):
+                return await open_advice_stream(deadline, json={**fields, "resume_text": resume_text})
+
+    try:
+        with timer.stage("request"):
+            return await open_advice_stream(deadline, json={**fields, "resume_sha256": resume_hash})
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code != 409:
+            raise
+    print("Resume not cached by the endpoint, uploading it")
+    with timer.stage("upload"):
+        return await upload_resume(fields, resume_file.name, deadline)
+
+# Identical requests in flight (many users clicking the same example) share
+# one call to the endpoint and its stream, which is aborted once they all leave
+advice_flights = AsyncSingleFlight(on_abandon=lambda key: abandoned_work.inc("app", "aborted"))
+
+def advice_key(bio, interest, resume_hash):
+    """Identity of a request: the endpoint would generate the same advice for it."""
+    return advice_cache_key(bio, interest, resume_hash, f"{GENERATION_MODE}:{OUTPUT_FORMAT}")
+
+async def advice_chunks(bio, interest, resume_file, resume_hash, deadline, timer):
+    """
+    Yields the endpoint's answer as ("text", chunk) for each chunk of streamed
+    Markdown, ("sections", chunk) when every chunk ends a section, or as a
+    single ("json", body) for a JSON response. Raises asyncio.TimeoutError
+    once deadline passes.
+    """
+    response = await request_advice(bio, interest, resume_file, resume_hash, deadline, timer)
+    try:
+        if response.headers.get("content-type", "").startswith("application/json"):
+            await asyncio.wait_for(response.aread(), time_left(deadline))
+            yield "json", response.text
         else:
-            formatted[key] = content
-    
-    return formatted
-
-def format_learning_content(content):
-    """Helper function to format learning card content"""
-    formatted = []
-    for line in content.split('\n'):
-        line = line.strip()
-        if 'Course:' in line:
-            course = line.split('Course:')[1].strip().strip('"')
-            formatted.append(f'<div class="course-name">📚 Course: {course}</div>')
-        elif 'Project:' in line:
-            project = line.split('Project:')[1].strip().strip('"')
-            formatted.append(f'<div class="project-name">💻 Project: {project}</div>')
-        elif 'Expected Outcome:' in line:
-            outcome = line.split('Expected Outcome:')[1].strip().strip('"')
-            formatted.append(f'<div class="outcome">🎯 Expected Outcome: {outcome}</div>')
-    return '\n'.join(formatted)
-
-def get_advice_from_agent(bio, interest, resume_file):
+            kind = "sections" if response.headers.get(CHUNKS_HEADER) == "sections" else "text"
+            chunks = response.aiter_text()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(anext(chunks), time_left(deadline))
+                except StopAsyncIteration:
+                    break
+                yield kind, chunk
+    finally:
+        await response.aclose()
+
+async def get_advice_from_agent(bio, interest, resume_file):
     """
     This function prepares the data and calls the Modal backend.
+    Sections are shown as soon as they finish streaming in. It runs on the
+    event loop, so waiting on the backend does not hold a worker thread.
+    A request identical to one already in flight follows that request's
+    stream instead of calling the backend again. When the Stop button (or
+    the user leaving) cancels the request, the backend call is aborted
+    unless another request is still following it.
     """
     if not bio or not interest:
-        sections = {
-            "summary": "Please provide your bio/goals and select an interest area.",
-            "roles": "", "skills": "", "learning": "",
-            "projects": "", "certifications": ""
-        }
-        formatted = format_sections(sections)
-        return [
-            formatted["summary"],
-            formatted["roles"],
-            formatted["skills"],
-            formatted["learning"],
-            formatted["projects"],
-            formatted["certifications"]
-        ]
-
-    # Show a thinking message immediately
-    sections = {
-        "summary": "🤔 Agent is thinking... Parsing your profile and crafting a response. This may take a moment.",
-        "roles": "", "skills": "", "learning": "",
-        "projects": "", "certifications": ""
-    }
-    formatted = format_sections(sections)
-    yield [
-        formatted["summary"],
-        formatted["roles"],
-        formatted["skills"],
-        formatted["learning"],
-        formatted["projects"],
-        formatted["certifications"]
-    ]
-
-    payload = {
-        "bio": bio,
-        "interest": interest,
-    }
-
-    # Handle the optional resume file
-    if resume_file is not None:
-        with open(resume_file.name, "rb") as f:
-            file_content = f.read()
-        encoded_file = base64.b64encode(file_content).decode("utf-8")
-        payload["resume"] = {
-            "name": resume_file.name,
-            "data": encoded_file
-        }
+        yield MISSING_INPUT_OUTPUTS + [""]
+        return
 
+    started = request_stats.start()
+    deadline = time.monotonic() + REQUEST_DEADLINE
+    timer = StageTimer("get_advice_from_agent", component="app")
+    chunks = None
     try:
-        print("Making request to Modal endpoint...")
-        response = requests.post(MODAL_WEB_ENDPOINT_URL, json=payload, timeout=120)
-        print(f"Response status code: {response.status_code}")
-        response.raise_for_status()
-        
-        result = response.json()
-        print("Raw response from Modal:", result)
-        
-        advice_text = result.get("advice", "")
-        print("Advice text:", advice_text[:200] + "..." if advice_text else "No advice text")
-        
-        sections = extract_sections(advice_text)
-        print("Extracted sections:", sections.keys())
-        
-        # Format sections with proper styling
-        formatted = format_sections(sections)
-        
-        output = [
-            formatted["summary"],
-            formatted["roles"],
-            formatted["skills"],
-            formatted["learning"],
-            formatted["projects"],
-            formatted["certifications"]
-        ]
-        print("Returning output with lengths:", [len(str(x)) for x in output])
-        yield output
-
+        # Show a thinking message immediately
+        yield THINKING_OUTPUTS + [request_stats.status(started)]
+
+        resume_hash = None
+        if resume_file is not None:
+            with timer.stage("resume_hash"):
+                resume_hash = await asyncio.to_thread(file_sha256, resume_file.name)
+        chunks = advice_flights.stream(
+            advice_key(bio, interest, resume_hash),
+            lambda: advice_chunks(bio, interest, resume_file, resume_hash, deadline, timer),
+        )
+
+        parser = SectionParser()
+        data = None
+        stream_started = time.perf_counter()
+        async for kind, text in chunks:
+            if kind == "json":
+                # Structured advice, and endpoints deployed without streaming
+                # support, answer with one JSON object
+                data = json.loads(text)
+                continue
+            with timer.stage("extract"):
+                finished = parser.feed(text)
+                if kind == "sections":
+                    # Fanout sections arrive whole, so show each one without
+                    # waiting for the next heading
+                    finished = parser.flush_section() or finished
+            if finished:
+                sections = parser.finished_sections()
+                if not sections["summary"]:
+                    sections["summary"] = THINKING_MESSAGE
+                timer.mark("first_section")
+                with timer.stage("render"):
+                    output = format_outputs(sections)
+                yield output + [request_stats.status(started)]
+        timer.record("stream", time.perf_counter() - stream_started)
+
+        structured = None
+        with timer.stage("extract"):
+            if data is None:
+                sections = parser.close()
+            elif data.get("structured"):
+                structured = advice_from_dict(data["structured"])
+            else:
+                sections = extract_sections(data.get("advice", ""))
+
+        with timer.stage("render"):
+            output = format_advice(structured) if structured else format_outputs(sections)
+        timer.mark("first_section")
+        elapsed = request_stats.finish(started)
+        started = None
+        yield output + [f"✅ Done in {elapsed:.1f}s"]
+
+    except (asyncio.CancelledError, GeneratorExit):
+        abandoned_work.inc("app", "cancelled")
+        raise
+    except asyncio.TimeoutError:
+        abandoned_work.inc("app", "deadline")
+        error_sections = placeholder_sections(
+            f"An error occurred: no answer within {REQUEST_DEADLINE:.0f}s, please try again.", "Error occurred"
+        )
+        yield format_outputs(error_sections) + [""]
     except Exception as e:
         print(f"Error occurred: {str(e)}")
-        error_sections = {
-            "summary": f"An error occurred: {str(e)}",
-            "roles": "Error occurred", 
-            "skills": "Error occurred", 
-            "learning": "Error occurred",
-            "projects": "Error occurred", 
-            "certifications": "Error occurred"
-        }
-        formatted = format_sections(error_sections)
-        yield [
-            formatted["summary"],
-            formatted["roles"],
-            formatted["skills"],
-            formatted["learning"],
-            formatted["projects"],
-            formatted["certifications"]
-        ]
+        # Only the summary varies; the other sections come from the render cache
+        error_sections = placeholder_sections(f"An error occurred: {str(e)}", "Error occurred")
+        yield format_outputs(error_sections) + [""]
+    finally:
+        if chunks is not None:
+            chunks.close()
+        if started is not None:
+            request_stats.finish(started)
+        timer.log()
 
 # Define the Gradio UI using Blocks for custom layout
-with gr.Blocks(theme=gr.themes.Soft(), title="AI Career Advisor") as demo:
+with gr.Blocks(
+    theme=gr.themes.Soft(),
+    title="AI Career Advisor",
+    css_paths=ADVISOR_CSS_PATH,
+    head_paths=ADVISOR_HEAD_PATH,
+) as demo:
     gr.Markdown(
         """
         # 🎯 AI Career Advisor
@@ -787,6 +399,8 @@ with gr.Blocks(theme=gr.themes.Soft(), title="AI Career Advisor") as demo:
                 file_types=[".pdf", ".docx"]
             )
             submit_btn = gr.Button("Get Career Advice", variant="primary")
+            stop_btn = gr.Button("Stop", variant="stop")
+            status_md = gr.Markdown()
 
         # Right column for output
         with gr.Column(scale=2):
@@ -805,11 +419,16 @@ with gr.Blocks(theme=gr.themes.Soft(), title="AI Career Advisor") as demo:
                 with gr.Tab("🎓 Certifications"):
                     cert_md = gr.HTML()
 
-    submit_btn.click(
+    advice_event = submit_btn.click(
         fn=get_advice_from_agent,
         inputs=[user_bio, interest_area, resume_upload],
-        outputs=[summary_md, roles_md, skills_md, learning_md, projects_md, cert_md]
+        outputs=[summary_md, roles_md, skills_md, learning_md, projects_md, cert_md, status_md],
+        concurrency_limit=CONCURRENCY_LIMIT,
+        # Shows the queue position and estimated wait while a request is queued
+        show_progress="full",
     )
+    # Cancelling the handler aborts its request to the Modal endpoint
+    stop_btn.click(fn=lambda: "⏹️ Stopped", outputs=status_md, cancels=[advice_event], queue=False)
 
     gr.Examples(
         examples=[
@@ -819,5 +438,9 @@ with gr.Blocks(theme=gr.themes.Soft(), title="AI Career Advisor") as demo:
         inputs=[user_bio, interest_area, resume_upload]
     )
 
+demo.queue(max_size=QUEUE_MAX_SIZE, default_concurrency_limit=DEFAULT_CONCURRENCY_LIMIT)
+
 if __name__ == "__main__":
-    demo.launch()
\ No newline at end of file
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    demo.launch(max_file_size=MAX_UPLOAD_BYTES)
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""
+Bytes sent to the browser per advice request, with the stylesheet inlined in
+every section (the previous behaviour) and registered once on the Blocks.
+
+A request yields the "thinking" placeholder and then the final advice; the
+old format_sections prepended the <style>/<script> block to five of the six
+outputs of each. The one-time assets are reported separately since they ship
+with the page, not with each response.
+
+    python benchmarks/bench_payload.py [advice.md]
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app
+
+# Outputs that used to carry the inline stylesheet: all but the summary
+STYLED_OUTPUTS = 5
+
+
+def request_outputs(advice_text):
+    thinking = app.format_outputs({key: '' for key in app.SECTION_KEYS} | {"summary": app.THINKING_MESSAGE})
+    final = app.format_outputs(app.extract_sections(advice_text))
+    return [thinking, final]
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "benchmarks", "sample_advice.md")
+    with open(path, encoding="utf-8") as f:
+        advice_text = f.read()
+
+    css = app.ADVISOR_CSS_PATH.read_text(encoding="utf-8")
+    head = app.ADVISOR_HEAD_PATH.read_text(encoding="utf-8")
+    inline_assets = len(f"<style>\n{css}</style>\n{head}".encode("utf-8"))
+
+    updates = request_outputs(advice_text)
+    after = sum(len(html.encode("utf-8")) for outputs in updates for html in outputs)
+    before = after + inline_assets * STYLED_OUTPUTS * len(updates)
+
+    print(f"inline style/script block:   {inline_assets:>8,} bytes")
+    print(f"per request, inlined:        {before:>8,} bytes")
+    print(f"per request, markup only:    {after:>8,} bytes  ({after / before:.1%} of before)")
+    print(f"one-time page assets:        {inline_assets:>8,} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+End-to-end load test of the advice pipeline with no network: Gemini is
+replaced by FakeModel (canned Markdown with a configurable time to first
+token and token rate) and the Modal endpoint by web_endpoint served locally
+under uvicorn.
+
+Runs --requests requests from --users concurrent simulated users against one
+of three targets and reports throughput and latency percentiles:
+
+    agent     get_career_advice called in-process (generation only)
+    endpoint  POSTs to web_endpoint, streaming the response
+    app       the Gradio handler get_advice_from_agent, through web_endpoint
+
+Each request gets its own bio unless --profiles is set, so by default every
+request misses the advice cache. With --stages the stage histograms recorded
+along the way (see career_advisor/metrics.py) are printed too.
+
+--quota-rpm and --quota-tpm make the fake model enforce Gemini-style
+per-minute quotas, answering 429 (ResourceExhausted) beyond them; the quota
+scheduler is configured as usual through ADVISOR_GEMINI_RPM/TPM.
+
+--abandon simulates churn: that share of the requests is given up after
+--abandon-after seconds, as when a user closes the tab or clicks Stop. The
+report then shows how many output chunks the fake model still produced and
+the abandoned-work counts, so the capacity freed by cancellation shows up:
+
+    python benchmarks/bench_pipeline.py --target app --users 50 --requests 500
+    ADVISOR_GEMINI_RPM=120 python benchmarks/bench_pipeline.py --target agent --quota-rpm 120
+    python benchmarks/bench_pipeline.py --target app --abandon 0.5 --abandon-after 1
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Stay off Modal: in-process advice cache, and no publishing of metrics
+os.environ.setdefault("ADVICE_CACHE_BACKEND", "memory")
+os.environ.setdefault("ADVISOR_METRICS_PUBLISH_INTERVAL", str(365 * 24 * 3600))
+os.environ.setdefault("ADVISOR_TIMING_LOG_SAMPLE_RATE", "0")
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from google.api_core.exceptions import DeadlineExceeded, ResourceExhausted
+
+import modal_agent_gemini as agent
+from career_advisor.metrics import abandoned_work, stage_seconds
+from career_advisor.resume import estimate_tokens
+
+# Rough Gemini tokenisation, used to turn the token rate into chunk delays
+CHARS_PER_TOKEN = 4
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """
+    Stands in for genai.GenerativeModel: answers every prompt with text after
+    latency seconds, then at token_rate tokens per second, streamed in chunks
+    of chunk_tokens tokens. Calls beyond rpm requests or tpm tokens in the
+    last minute (0: unlimited) are rejected with ResourceExhausted, and
+    unstreamed calls running past request_options["timeout"] with
+    DeadlineExceeded.
+    """
+
+    def __init__(self, text, latency=0.5, token_rate=200.0, chunk_tokens=20, rpm=0, tpm=0):
+        self.text = text
+        self.latency = latency
+        self.token_rate = token_rate
+        self.chunk_chars = chunk_tokens * CHARS_PER_TOKEN
+        self.rpm = rpm
+        self.tpm = tpm
+        self.calls = 0
+        self.throttled = 0
+        self.chunks = 0
+        # (time, tokens) of the calls admitted in the last minute
+        self.window = deque()
+        self.lock = threading.Lock()
+
+    def _check_quota(self, prompt):
+        tokens = estimate_tokens(prompt) + estimate_tokens(self.text)
+        now = time.monotonic()
+        with self.lock:
+            while self.window and self.window[0][0] <= now - 60:
+                self.window.popleft()
+            used = sum(used for _, used in self.window)
+            if (self.rpm and len(self.window) >= self.rpm) or (self.tpm and used + tokens > self.tpm):
+                self.throttled += 1
+                raise ResourceExhausted("429 Resource has been exhausted (e.g. check quota).")
+            self.window.append((now, tokens))
+            self.calls += 1
+
+    def _chunks(self):
+        time.sleep(self.latency)
+        for i in range(0, len(self.text), self.chunk_chars):
+            chunk = self.text[i:i + self.chunk_chars]
+            time.sleep(len(chunk) / CHARS_PER_TOKEN / self.token_rate)
+            with self.lock:
+                self.chunks += 1
+            yield FakeChunk(chunk)
+
+    def generate_content(self, prompt, generation_config=None, stream=False, request_options=None):
+        self._check_quota(prompt)
+        if stream:
+            return self._chunks()
+        timeout = (request_options or {}).get("timeout")
+        started = time.monotonic()
+        for _ in self._chunks():
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise DeadlineExceeded("504 Deadline Exceeded")
+        return FakeChunk(self.text)
+
+
+def serve_endpoint():
+    """Serves web_endpoint on a free local port and returns its URL."""
+    api = FastAPI()
+
+    @api.post("/")
+    async def advice(request: Request):
+        return await agent.web_endpoint.local(request)
+
+    server = uvicorn.Server(uvicorn.Config(api, host="127.0.0.1", port=0, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return f"http://127.0.0.1:{port}/"
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def profile(i, profiles):
+    bio = f"Backend developer with {i % profiles if profiles else i} years of Python and SQL experience."
+    return bio, "Data Science"
+
+
+async def run_agent(i, args, url, client):
+    bio, interest = profile(i, args.profiles)
+    advice = await asyncio.to_thread(agent.get_career_advice.local, bio, interest, mode=args.mode)
+    if advice.startswith(("Error", "An unexpected")):
+        raise RuntimeError(advice)
+    return None, len(advice)
+
+
+async def run_endpoint(i, args, url, client):
+    bio, interest = profile(i, args.profiles)
+    started = time.perf_counter()
+    first = None
+    size = 0
+    fields = {"bio": bio, "interest": interest, "stream": True, "mode": args.mode}
+    async with client.stream("POST", url, json=fields) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_text():
+            if first is None:
+                first = time.perf_counter() - started
+            size += len(chunk)
+    return first, size
+
+
+async def run_app(i, args, url, client):
+    import app
+
+    bio, interest = profile(i, args.profiles)
+    started = time.perf_counter()
+    first = None
+    updates = 0
+    async for outputs in app.get_advice_from_agent(bio, interest, None):
+        updates += 1
+        # The first update is the "thinking" placeholder; the next carries advice
+        if updates == 2:
+            first = time.perf_counter() - started
+    if "An error occurred" in outputs[0]:
+        raise RuntimeError(outputs[0])
+    return first, updates
+
+
+TARGETS = {"agent": run_agent, "endpoint": run_endpoint, "app": run_app}
+
+
+async def load(args, url):
+    """Runs args.requests requests from args.users concurrent users; returns per-request results and the time taken."""
+    run = TARGETS[args.target]
+    # One thread per user for the blocking agent calls, so the default pool's size does not cap the load
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.users))
+    pending = iter(range(args.requests))
+    results = []
+    errors = []
+    abandoned = []
+    rng = random.Random(0)
+    started = time.perf_counter()
+
+    async with httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=args.users)) as client:
+        async def user():
+            for i in pending:
+                started = time.perf_counter()
+                try:
+                    if rng.random() < args.abandon:
+                        await asyncio.wait_for(run(i, args, url, client), args.abandon_after)
+                        results.append((time.perf_counter() - started, None))
+                        continue
+                    first, _ = await run(i, args, url, client)
+                except asyncio.TimeoutError:
+                    abandoned.append(i)
+                    continue
+                except Exception as e:
+                    errors.append(repr(e))
+                    continue
+                results.append((time.perf_counter() - started, first))
+
+        await asyncio.gather(*[user() for _ in range(args.users)])
+        elapsed = time.perf_counter() - started
+        # Give the servers a moment to notice the abandoned requests before the report
+        if abandoned:
+            await asyncio.sleep(1)
+    return results, errors, abandoned, elapsed
+
+
+def report(args, results, errors, abandoned, elapsed, model):
+    latencies = [latency for latency, _ in results]
+    firsts = [first for _, first in results if first is not None]
+    print(f"target={args.target} mode={args.mode} users={args.users} requests={args.requests} "
+          f"latency={args.latency}s token_rate={args.token_rate}/s")
+    print(f"completed {len(results)}, failed {len(errors)}, abandoned {len(abandoned)}, "
+          f"model calls {model.calls}, rate limited {model.throttled}, {elapsed:.2f}s")
+    print(f"model output chunks {model.chunks}, abandoned work {abandoned_work.summary()}")
+    print(f"quota scheduler {agent.get_advisor().scheduler.stats()}")
+    print(f"throughput {len(results) / elapsed:.1f} req/s")
+    if not latencies:
+        return
+    print(f"{'':<16}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    rows = [("latency", latencies)] + ([("first output", firsts)] if firsts else [])
+    for label, values in rows:
+        print(f"{label:<16}" + "".join(f"{percentile(values, q) * 1000:>8.0f}ms" for q in (0.5, 0.95, 0.99, 1.0)))
+    for error in sorted(set(errors))[:5]:
+        print(f"error: {error}")
+    if args.stages:
+        print(f"\n{'stage':<40}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for stage, row in stage_seconds.summary().items():
+            print(f"{stage:<40}{row['count']:>8}" + "".join(f"{row[p] * 1000:>8.1f}ms" for p in ("p50", "p95", "p99")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=sorted(TARGETS), default="app")
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--profiles", type=int, default=0,
+                        help="number of distinct profiles to cycle through (0: every request is new)")
+    parser.add_argument("--mode", choices=("single", "fanout"), default="single")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model time to first token, seconds")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="fake model output tokens per second")
+    parser.add_argument("--chunk-tokens", type=int, default=20)
+    parser.add_argument("--quota-rpm", type=int, default=0, help="fake model requests per minute (0: unlimited)")
+    parser.add_argument("--quota-tpm", type=int, default=0, help="fake model tokens per minute (0: unlimited)")
+    parser.add_argument("--advice", default=os.path.join(ROOT, "benchmarks", "sample_advice.md"),
+                        help="canned Markdown the fake model answers with")
+    parser.add_argument("--abandon", type=float, default=0.0, help="share of requests given up early")
+    parser.add_argument("--abandon-after", type=float, default=1.0,
+                        help="seconds after which an abandoned request is given up")
+    parser.add_argument("--stages", action="store_true", help="print the stage latency summary as well")
+    args = parser.parse_args()
+
+    with open(args.advice, encoding="utf-8") as f:
+        text = f.read()
+    model = FakeModel(text, latency=args.latency, token_rate=args.token_rate, chunk_tokens=args.chunk_tokens,
+                      rpm=args.quota_rpm, tpm=args.quota_tpm)
+    agent._advisor = agent.GeminiAdvisor(model=model)
+
+    url = None
+    if args.target != "agent":
+        url = serve_endpoint()
+        os.environ["MODAL_WEB_ENDPOINT_URL"] = url
+    if args.target == "app":
+        import app
+        app.MODAL_WEB_ENDPOINT_URL = url
+        app.GENERATION_MODE = args.mode
+
+    results, errors, abandoned, elapsed = asyncio.run(load(args, url))
+    report(args, results, errors, abandoned, elapsed, model)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+"""
+Benchmark for the template renderer in career_advisor/render.py against the
+previous f-string formatters from app.py.
+
+Renders synthetic responses (variations of sample_advice.md) with both, and
+again through render_cache once every response has been seen, and reports throughput, the peak memory traced by tracemalloc while rendering
+1000 of them (a stand-in for allocation volume) and the size of the markup
+sent to the browser for one response.
+
+    python benchmarks/bench_renderer.py --responses 10000
+"""
+import argparse
+import html
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from career_advisor.render import SECTION_RENDERERS, format_outputs, render_cache
+from career_advisor.sections import SECTION_KEYS, extract_sections
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_advice.md")
+
+
+# The original formatters from app.py, kept here for comparison
+def legacy_format_skill_bars(text):
+    """Convert skill meter text to HTML progress bars"""
+    formatted = []
+    in_skill_meter = False
+    for line in text.split('\n'):
+        if '```skill-meter' in line:
+            in_skill_meter = True
+            formatted.append('<div class="skill-bars">')
+            continue
+        elif '```' in line and in_skill_meter:
+            in_skill_meter = False
+            formatted.append('</div>')
+            continue
+        
+        if in_skill_meter and '[' in line and ']' in line:
+            try:
+                skill_name, rest = line.split('[')
+                percentage = re.search(r'(\d+)%', rest)
+                if percentage:
+                    pct = int(percentage.group(1))
+                    formatted.append(f'''
+                    <div class="skill-bar">
+                        <div class="skill-name">{skill_name.strip()}</div>
+                        <div class="progress-bar">
+                            <div class="progress" style="width: {pct}%; background-color: #3498db;"></div>
+                        </div>
+                        <div class="percentage">{pct}%</div>
+                    </div>
+                    ''')
+            except:
+                formatted.append(line)
+        else:
+            formatted.append(line)
+    
+    return '\n'.join(formatted)
+
+def legacy_format_project_cards(text):
+    """Convert project-card text to HTML cards"""
+    formatted = []
+    in_project_card = False
+    current_card = {}
+    
+    for line in text.split('\n'):
+        if '```project-card' in line:
+            in_project_card = True
+            current_card = {}
+            continue
+        elif '```' in line and in_project_card:
+            in_project_card = False
+            if current_card:
+                card_html = f'''
+                <div class="project-card">
+                    <div>{current_card.get('project', 'Project')}</div>
+                    <div><strong>Difficulty:</strong> {current_card.get('difficulty', '⭐⭐⭐')}</div>
+                    <div><strong>Duration:</strong> {current_card.get('duration', '2 weeks')}</div>
+                    <div><strong>Skills:</strong> {current_card.get('skills', 'Various skills')}</div>
+                    <div><strong>Description:</strong> {current_card.get('description', 'Project description')}</div>
+                </div>
+                '''
+                formatted.append(card_html)
+            continue
+        
+        if in_project_card:
+            line = line.strip()
+            if line.startswith('Project:'):
+                current_card['project'] = line[len('Project:'):].strip()
+            elif line.startswith('Difficulty:'):
+                current_card['difficulty'] = line[len('Difficulty:'):].strip()
+            elif line.startswith('Duration:'):
+                current_card['duration'] = line[len('Duration:'):].strip()
+            elif line.startswith('Skills:'):
+                current_card['skills'] = line[len('Skills:'):].strip()
+            elif line.startswith('Description:'):
+                current_card['description'] = line[len('Description:'):].strip()
+        else:
+            formatted.append(line)
+    
+    return '\n'.join(formatted)
+
+def legacy_format_roles(content):
+    """Format roles as cards"""
+    formatted_content = []
+    current_role = []
+    in_role = False
+    
+    for line in content.split('\n'):
+        if line.strip().startswith('1.') or line.strip().startswith('2.') or line.strip().startswith('3.'):
+            if in_role:
+                formatted_content.append(legacy_format_role_card(current_role))
+            in_role = True
+            current_role = [line]
+        elif in_role and line.strip():
+            current_role.append(line)
+    
+    if current_role:
+        formatted_content.append(legacy_format_role_card(current_role))
+    
+    return '\n'.join(formatted_content)
+
+def legacy_format_role_card(role_lines):
+    """Helper function to format role card"""
+    role_title = role_lines[0].strip()
+    # Extract role name and match score
+    role_name = ""
+    match_score = ""
+    if "**" in role_title:
+        parts = role_title.split("**")
+        if len(parts) > 1:
+            role_name = parts[1].strip()
+            if "(Match Score:" in role_title:
+                match_parts = role_title.split("(Match Score:")
+                if len(match_parts) > 1:
+                    match_score = match_parts[1].split(")")[0].strip()
+    
+    card_html = f'''
+    <div class="role-card">
+        <div class="role-title">{role_name} (Match Score: {match_score})</div>
+    '''
+    
+    for line in role_lines[1:]:
+        line = line.strip()
+        if line.startswith('-'):
+            detail = line[1:].strip()
+            if "Salary Range:" in detail:
+                card_html += f'<div class="role-detail"><strong>Salary Range:</strong> {detail.split("Salary Range:")[1].strip()}</div>'
+            elif "Key Requirements:" in detail:
+                card_html += f'<div class="role-detail"><strong>Key Requirements:</strong> {detail.split("Key Requirements:")[1].strip()}</div>'
+            elif "Why It Fits:" in detail:
+                card_html += f'<div class="role-detail"><strong>Why It Fits:</strong> {detail.split("Why It Fits:")[1].strip()}</div>'
+            else:
+                card_html += f'<div class="role-detail">{detail}</div>'
+    
+    card_html += '</div>'
+    return card_html
+
+def legacy_format_certification_card(cert_lines):
+    """Helper function to format certification card"""
+    cert_name = cert_lines[0].replace('*', '').strip()
+    card_html = f'''
+    <div class="cert-card">
+        <div class="cert-name">{cert_name}</div>
+    '''
+    
+    for line in cert_lines[1:]:
+        if line.strip():
+            line = line.strip().strip('*').strip('-').strip()
+            if "difficulty level:" in line.lower():
+                stars = line.split(":", 1)[1].strip() if ":" in line else ""
+                card_html += f'<div class="cert-detail">- Difficulty Level: {stars}</div>'
+            elif "time commitment:" in line.lower():
+                time = line.split(":", 1)[1].strip() if ":" in line else ""
+                card_html += f'<div class="cert-detail">- Time Commitment: {time}</div>'
+            elif "cost range:" in line.lower():
+                cost = line.split(":", 1)[1].strip() if ":" in line else ""
+                card_html += f'<div class="cert-detail">- Cost Range: {cost}</div>'
+            else:
+                card_html += f'<div class="cert-detail">• {line}</div>'
+    
+    card_html += '</div>'
+    return card_html
+
+def legacy_parse_certifications(content):
+    """Parse certification content to group details by certification"""
+    lines = content.split('\n')
+    cert_groups = []
+    current_cert = []
+    
+    # Check if content follows the format from the screenshot with dashes
+    has_cert_headers = any(line.strip().startswith('- ') for line in lines)
+    
+    if has_cert_headers:
+        cert_name = ""
+        cert_details = []
+        
+        for i, line in enumerate(lines):
+            line = line.strip()
+            if not line:
+                continue
+                
+            if line.startswith('- ') and not any(detail in line.lower() for detail in ['difficulty level', 'time commitment', 'cost range']):
+                # This is a new certificate name
+                if cert_name:
+                    # Save the previous certificate
+                    cert_groups.append([f"* {cert_name}"] + cert_details)
+                
+                cert_name = line[2:].strip()
+                cert_details = []
+            elif line.startswith('- '):
+                # This is a detail for the current certificate
+                cert_details.append(line)
+        
+        # Add the last certificate
+        if cert_name:
+            cert_groups.append([f"* {cert_name}"] + cert_details)
+    else:
+        # Fall back to original parsing
+        in_cert = False
+        for line in lines:
+            if line.strip().startswith('*'):
+                if in_cert and current_cert:
+                    cert_groups.append(current_cert)
+                in_cert = True
+                current_cert = [line]
+            elif in_cert and line.strip():
+                current_cert.append(line)
+        
+        if current_cert:
+            cert_groups.append(current_cert)
+    
+    return cert_groups
+
+def legacy_format_sections(sections):
+    """
+    Format all sections as HTML markup. The stylesheet and scripts they rely on
+    are registered once on the Blocks (see ADVISOR_CSS_PATH / ADVISOR_HEAD_PATH).
+    """
+    formatted = {}
+    for key, content in sections.items():
+        if key == 'skills':
+            formatted[key] = legacy_format_skill_bars(content)
+        elif key == 'summary':
+            # Format summary as an expandable card
+            lines = content.split('\n')
+            formatted_content = ['<div class="expandable-card expanded">']
+            formatted_content.append('<div class="card-header">')
+            formatted_content.append('<div class="card-title">Quick Summary</div>')
+            formatted_content.append('<div class="expand-icon">▼</div>')
+            formatted_content.append('</div>')
+            formatted_content.append('<div class="card-content">')
+            for line in lines:
+                if line.strip():
+                    formatted_content.append(f'<div class="content-line">{line}</div>')
+            formatted_content.append('</div>')
+            formatted_content.append('</div>')
+            formatted[key] = '\n'.join(formatted_content)
+        elif key == 'roles':
+            # Format roles as cards
+            formatted[key] = legacy_format_roles(content)
+        elif key == 'projects':
+            # Format projects as cards
+            formatted[key] = legacy_format_project_cards(content)
+        elif key == 'learning':
+            # Format learning path as cards
+            formatted_content = []
+            current_month = []
+            in_month = False
+            
+            for line in content.split('\n'):
+                if line.strip().startswith('1.') or line.strip().startswith('2.') or line.strip().startswith('3.'):
+                    if in_month:
+                        card_content = '\n'.join(current_month)
+                        month_range = current_month[0].split(':')[0].replace('*', '').strip()
+                        card_html = f'''
+                        <div class="learning-card">
+                            <div class="month-range">{month_range}</div>
+                            {legacy_format_learning_content(card_content)}
+                        </div>
+                        '''
+                        formatted_content.append(card_html)
+                    in_month = True
+                    current_month = [line]
+                elif in_month:
+                    current_month.append(line)
+            
+            if current_month:
+                card_content = '\n'.join(current_month)
+                month_range = current_month[0].split(':')[0].replace('*', '').strip()
+                card_html = f'''
+                <div class="learning-card">
+                    <div class="month-range">{month_range}</div>
+                    {legacy_format_learning_content(card_content)}
+                </div>
+                '''
+                formatted_content.append(card_html)
+            
+            formatted[key] = '\n'.join(formatted_content)
+        elif key == 'certifications':
+            # Format certifications as cards
+            formatted_content = []
+            
+            # Parse certifications into groups
+            cert_groups = legacy_parse_certifications(content)
+            
+            for cert_group in cert_groups:
+                formatted_content.append(legacy_format_certification_card(cert_group))
+            
+            if not formatted_content:
+                # If no certifications were found, add a placeholder
+                formatted_content.append('<div class="cert-card"><div class="cert-name">No certifications found</div></div>')
+            
+            formatted[key] = '\n'.join(formatted_content)
+        else:
+            formatted[key] = content
+    
+    return formatted
+
+def legacy_format_learning_content(content):
+    """Helper function to format learning card content"""
+    formatted = []
+    for line in content.split('\n'):
+        line = line.strip()
+        if 'Course:' in line:
+            course = line.split('Course:')[1].strip().strip('"')
+            formatted.append(f'<div class="course-name">📚 Course: {course}</div>')
+        elif 'Project:' in line:
+            project = line.split('Project:')[1].strip().strip('"')
+            formatted.append(f'<div class="project-name">💻 Project: {project}</div>')
+        elif 'Expected Outcome:' in line:
+            outcome = line.split('Expected Outcome:')[1].strip().strip('"')
+            formatted.append(f'<div class="outcome">🎯 Expected Outcome: {outcome}</div>')
+    return '\n'.join(formatted)
+
+def legacy_format_outputs(sections):
+    """Format sections and return them in the order of the output components"""
+    formatted = legacy_format_sections(sections)
+    return [formatted[key] for key in SECTION_KEYS]
+
+
+def synthetic_responses(count):
+    """Section dicts for count responses that differ in names and percentages."""
+    with open(SAMPLE_PATH, encoding="utf-8") as f:
+        sample = f.read()
+    responses = []
+    for i in range(count):
+        text = re.sub(r"(\d+)%", lambda m: f"{(int(m.group(1)) + i) % 100}%", sample)
+        text = text.replace("Engineer", f"Engineer {i}").replace("Project: ", f"Project: #{i} ")
+        responses.append(extract_sections(text))
+    return responses
+
+
+def visible_text(markup):
+    """Text a reader sees, for checking both renderers show the same content."""
+    return re.sub(r"<[^>]+>|\s+", "", html.unescape(markup))
+
+
+def render_uncached(sections):
+    """The template renderers without render_cache in front of them."""
+    return [SECTION_RENDERERS[key](sections[key]) for key in SECTION_KEYS]
+
+
+def render_all(render, responses):
+    for sections in responses:
+        render(sections)
+
+
+def measure(render, responses, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render_all(render, responses)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    render_all(render, responses[:1000])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--responses", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    responses = synthetic_responses(args.responses)
+    for key, legacy, new in zip(SECTION_KEYS, legacy_format_outputs(responses[0]), render_uncached(responses[0])):
+        assert visible_text(legacy) == visible_text(new), key
+    # Large enough for every section, so the cached row measures repeated advice
+    render_cache.max_entries = len(responses) * len(SECTION_KEYS)
+    render_cache.max_bytes = None
+    render_all(format_outputs, responses)
+
+    print(f"{'renderer':>10} {'total ms':>10} {'µs/response':>12} {'responses/s':>12} {'peak KiB/1k':>12} "
+          f"{'bytes out':>10}")
+    for name, render in (("legacy", legacy_format_outputs), ("template", render_uncached), ("cached", format_outputs)):
+        seconds, peak = measure(render, responses, args.repeat)
+        size = sum(len(markup.encode()) for markup in render(responses[0]))
+        print(f"{name:>10} {seconds * 1e3:>10.1f} {seconds / len(responses) * 1e6:>12.1f} "
+              f"{len(responses) / seconds:>12.0f} {peak / 1024:>12.1f} {size:>10}")
+
+
+if __name__ == "__main__":
+    main()
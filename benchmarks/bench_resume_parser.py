@@ -0,0 +1,113 @@
+"""
+Resume extraction throughput in pages per second.
+
+Generates synthetic PDF and DOCX resumes of 1-200 pages (DOCX "pages" are
+40 paragraphs, every fifth page also holding a table) and times the
+previous parse_resume, the sequential extractor and the process-parallel
+PDF extractor.
+
+    python benchmarks/bench_resume_parser.py [--pages 1 10 50 200]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx
+import fitz  # PyMuPDF
+
+from career_advisor import resume
+
+LINES_PER_PAGE = 40
+LINE = "Led migration of {n} Java services to Kubernetes, cutting deploy time by 40% and on-call pages by half."
+
+
+def legacy_parse_resume(file_content, filename):
+    """The original implementation, kept here for comparison"""
+    text = ""
+    if filename.lower().endswith(".pdf"):
+        pdf_document = fitz.open(stream=file_content, filetype="pdf")
+        for page in pdf_document:
+            text += page.get_text()
+        pdf_document.close()
+    elif filename.lower().endswith(".docx"):
+        doc = docx.Document(io.BytesIO(file_content))
+        for para in doc.paragraphs:
+            text += para.text + "\n"
+    return text
+
+
+def synthetic_pdf(pages):
+    pdf = fitz.open()
+    for page_number in range(pages):
+        page = pdf.new_page()
+        text = "\n".join(LINE.format(n=page_number * LINES_PER_PAGE + i) for i in range(LINES_PER_PAGE))
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=8)
+    data = pdf.tobytes()
+    pdf.close()
+    return data
+
+
+def synthetic_docx(pages):
+    document = docx.Document()
+    for page_number in range(pages):
+        for i in range(LINES_PER_PAGE):
+            document.add_paragraph(LINE.format(n=page_number * LINES_PER_PAGE + i))
+        if page_number % 5 == 0:
+            table = document.add_table(rows=3, cols=2)
+            for row in table.rows:
+                row.cells[0].text = "Skill"
+                row.cells[1].text = "Kubernetes, Terraform"
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def pages_per_second(pages, repeat, fn, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return pages / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=resume.PAGE_WORKERS)
+    args = parser.parse_args()
+
+    # Warm the worker processes so pool start-up is not counted
+    resume.extract_pdf_text(synthetic_pdf(resume.PARALLEL_MIN_PAGES), 0, workers=args.workers)
+
+    print(f"{'format':<6} {'pages':>6} {'legacy p/s':>11} {'sequential p/s':>15} {'parallel p/s':>13}")
+    for pages in args.pages:
+        pdf = synthetic_pdf(pages)
+        legacy = pages_per_second(pages, args.repeat, legacy_parse_resume, pdf, "cv.pdf")
+        sequential = pages_per_second(pages, args.repeat, resume.extract_pdf_text, pdf, 0, 1)
+        if pages >= resume.PARALLEL_MIN_PAGES:
+            parallel = pages_per_second(pages, args.repeat, resume.extract_pdf_text, pdf, 0, args.workers)
+            parallel_col = f"{parallel:>13.0f}"
+        else:
+            parallel_col = f"{'-':>13}"
+        print(f"{'pdf':<6} {pages:>6} {legacy:>11.0f} {sequential:>15.0f} {parallel_col}")
+
+    for pages in args.pages:
+        document = synthetic_docx(pages)
+        legacy = pages_per_second(pages, args.repeat, legacy_parse_resume, document, "cv.docx")
+        sequential = pages_per_second(pages, args.repeat, resume.extract_docx_text, document, 0)
+        print(f"{'docx':<6} {pages:>6} {legacy:>11.0f} {sequential:>15.0f} {'-':>13}")
+
+    budget = 20_000
+    pdf = synthetic_pdf(max(args.pages))
+    capped = pages_per_second(max(args.pages), args.repeat, resume.extract_pdf_text, pdf, budget, 1)
+    print(f"pdf {max(args.pages)} pages with a {budget:,}-char budget: {capped:.0f} p/s (stops early)")
+
+
+if __name__ == "__main__":
+    main()
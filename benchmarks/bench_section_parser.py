@@ -0,0 +1,95 @@
+"""
+Micro-benchmark for SectionParser against the previous line-by-line extract_sections.
+
+Builds synthetic agent responses of 10k-100k lines and times a one-shot parse,
+a streamed parse (small chunks with the finished sections read after every
+chunk that completes one) and the old implementation, which re-joins the
+current section on every line.
+
+    python benchmarks/bench_section_parser.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from career_advisor.sections import SECTION_HEADINGS, SectionParser, extract_sections
+
+
+def legacy_extract_sections(markdown_text):
+    """The original implementation, kept here for comparison"""
+    sections = {key: '' for _, key in SECTION_HEADINGS if key}
+    current_section = None
+    current_content = []
+    for line in markdown_text.split('\n'):
+        for prefix, key in SECTION_HEADINGS:
+            if line.startswith(prefix):
+                current_section = key
+                current_content = []
+                break
+        else:
+            if current_section:
+                current_content.append(line)
+                sections[current_section] = '\n'.join(current_content)
+    return sections
+
+
+def synthetic_response(n_lines):
+    """A response with every heading (roadmap included) and n_lines lines of content."""
+    per_section = max(1, n_lines // len(SECTION_HEADINGS))
+    lines = []
+    for prefix, key in SECTION_HEADINGS:
+        lines.append(f"{prefix} {key or 'roadmap'}")
+        for i in range(per_section):
+            lines.append(f"    - Line {i} of the {key} section with some **bold** text and a 42% figure")
+    return '\n'.join(lines) + '\n'
+
+
+def parse_streaming(text, chunk_size):
+    parser = SectionParser()
+    for start in range(0, len(text), chunk_size):
+        if parser.feed(text[start:start + chunk_size]):
+            parser.finished_sections()
+    return parser.close()
+
+
+def best_of(repeat, fn, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 25_000, 50_000, 100_000])
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy-max-lines", type=int, default=25_000,
+                        help="skip the quadratic implementation above this size")
+    args = parser.parse_args()
+
+    print(f"{'lines':>8} {'one-shot ms':>12} {'ns/line':>8} {'streamed ms':>12} {'ns/line':>8} {'legacy ms':>10} {'ns/line':>8}")
+    for n_lines in args.sizes:
+        text = synthetic_response(n_lines)
+        assert extract_sections(text) == parse_streaming(text, args.chunk_size)
+
+        one_shot = best_of(args.repeat, extract_sections, text)
+        streamed = best_of(args.repeat, parse_streaming, text, args.chunk_size)
+        if n_lines <= args.legacy_max_lines:
+            assert legacy_extract_sections(text) == extract_sections(text)
+            legacy = best_of(1, legacy_extract_sections, text)
+            legacy_cols = f"{legacy * 1e3:>10.1f} {legacy / n_lines * 1e9:>8.0f}"
+        else:
+            legacy_cols = f"{'skipped':>10} {'':>8}"
+
+        print(f"{n_lines:>8} {one_shot * 1e3:>12.1f} {one_shot / n_lines * 1e9:>8.0f} "
+              f"{streamed * 1e3:>12.1f} {streamed / n_lines * 1e9:>8.0f} {legacy_cols}")
+
+
+if __name__ == "__main__":
+    main()
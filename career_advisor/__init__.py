@@ -0,0 +1 @@
+"""Shared helpers for the AI Career Advisor Gradio app and Modal agent."""
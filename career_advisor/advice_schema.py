@@ -0,0 +1,197 @@
+"""Typed advice for the structured (JSON) output mode, and the schema Gemini fills in."""
+import json
+from dataclasses import asdict, dataclass, field
+from typing import List
+
+# Response schema passed to Gemini as generation_config["response_schema"]
+ADVICE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "roles": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "match_score": {"type": "integer", "description": "1-10"},
+                    "salary_range": {"type": "string", "description": "e.g. $95,000 - $140,000"},
+                    "key_requirements": {"type": "array", "items": {"type": "string"}},
+                    "why_it_fits": {"type": "string"},
+                },
+                "required": ["title", "match_score", "salary_range", "key_requirements", "why_it_fits"],
+            },
+        },
+        "skills": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "percentage": {"type": "integer", "description": "0-100"},
+                },
+                "required": ["name", "percentage"],
+            },
+        },
+        "learning_path": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "months": {"type": "string", "description": "e.g. Month 1-2"},
+                    "focus": {"type": "string"},
+                    "course": {"type": "string", "description": "Course name (Platform)"},
+                    "project": {"type": "string"},
+                    "expected_outcome": {"type": "string"},
+                },
+                "required": ["months", "focus", "course", "project", "expected_outcome"],
+            },
+        },
+        "projects": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "difficulty": {"type": "integer", "description": "1-5"},
+                    "duration": {"type": "string"},
+                    "skills": {"type": "array", "items": {"type": "string"}},
+                    "description": {"type": "string"},
+                },
+                "required": ["name", "difficulty", "duration", "skills", "description"],
+            },
+        },
+        "certifications": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "provider": {"type": "string"},
+                    "difficulty": {"type": "integer", "description": "1-5"},
+                    "time_commitment": {"type": "string"},
+                    "cost_range": {"type": "string"},
+                },
+                "required": ["name", "provider", "difficulty", "time_commitment", "cost_range"],
+            },
+        },
+    },
+    "required": ["summary", "roles", "skills", "learning_path", "projects", "certifications"],
+}
+
+
+@dataclass
+class Role:
+    title: str
+    match_score: int
+    salary_range: str = ""
+    key_requirements: List[str] = field(default_factory=list)
+    why_it_fits: str = ""
+
+
+@dataclass
+class Skill:
+    name: str
+    percentage: int
+
+
+@dataclass
+class LearningStep:
+    months: str
+    focus: str = ""
+    course: str = ""
+    project: str = ""
+    expected_outcome: str = ""
+
+
+@dataclass
+class Project:
+    name: str
+    difficulty: int = 3
+    duration: str = ""
+    skills: List[str] = field(default_factory=list)
+    description: str = ""
+
+
+@dataclass
+class Certification:
+    name: str
+    provider: str = ""
+    difficulty: int = 3
+    time_commitment: str = ""
+    cost_range: str = ""
+
+
+@dataclass
+class Advice:
+    summary: str
+    roles: List[Role] = field(default_factory=list)
+    skills: List[Skill] = field(default_factory=list)
+    learning_path: List[LearningStep] = field(default_factory=list)
+    projects: List[Project] = field(default_factory=list)
+    certifications: List[Certification] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def stars(rating: int, out_of: int = 5) -> str:
+    """Difficulty rating as the star string the Markdown prompt uses, e.g. ⭐⭐⭐☆☆."""
+    return "⭐" * rating + "☆" * (out_of - rating)
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, int(value)))
+
+
+def _strings(value):
+    if isinstance(value, str):
+        return [part.strip() for part in value.split(",") if part.strip()]
+    return [str(item) for item in value or []]
+
+
+def _build(cls, item: dict, **overrides):
+    """Instantiates cls from the schema fields of item, ignoring unknown keys."""
+    known = {name: item[name] for name in cls.__dataclass_fields__ if name in item}
+    known.update(overrides)
+    return cls(**known)
+
+
+def advice_from_dict(data: dict) -> Advice:
+    """Builds typed advice from the model's JSON object; raises ValueError if it does not fit the schema."""
+    try:
+        return Advice(
+            summary=str(data["summary"]),
+            roles=[
+                _build(Role, item, match_score=_clamp(item.get("match_score", 0), 0, 10),
+                       key_requirements=_strings(item.get("key_requirements")))
+                for item in data.get("roles", [])
+            ],
+            skills=[
+                _build(Skill, item, percentage=_clamp(item.get("percentage", 0), 0, 100))
+                for item in data.get("skills", [])
+            ],
+            learning_path=[_build(LearningStep, item) for item in data.get("learning_path", [])],
+            projects=[
+                _build(Project, item, difficulty=_clamp(item.get("difficulty", 3), 1, 5),
+                       skills=_strings(item.get("skills")))
+                for item in data.get("projects", [])
+            ],
+            certifications=[
+                _build(Certification, item, difficulty=_clamp(item.get("difficulty", 3), 1, 5))
+                for item in data.get("certifications", [])
+            ],
+        )
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise ValueError(f"Advice does not match the schema: {e!r}") from e
+
+
+def parse_advice(text: str) -> Advice:
+    """Parses the model's JSON response into typed advice; raises ValueError if it is malformed."""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Advice is not valid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError("Advice is not a JSON object")
+    return advice_from_dict(data)
@@ -0,0 +1,233 @@
+"""Caches for generated advice, keyed on the normalized user profile."""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Case- and whitespace-insensitive form of free text used in cache keys."""
+    return " ".join((text or "").split()).casefold()
+
+
+def content_hash(data):
+    """SHA-256 hex digest of text or bytes."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def advice_cache_key(bio, interest, resume_text, prompt_version):
+    """Identity of an advice request: same key, same prompt sent to the model."""
+    resume_hash = content_hash(resume_text) if resume_text else ""
+    parts = [str(prompt_version), normalize_text(bio), interest or "", resume_hash]
+    return content_hash("\x1f".join(parts))
+
+
+class Cache:
+    """Base class for cache backends; counts hits and misses."""
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value or None."""
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl if self.ttl else None
+        self._set(key, (expires_at, value))
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, entry):
+        raise NotImplementedError
+
+    @staticmethod
+    def _unwrap(entry):
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.time():
+            return None
+        return value
+
+
+class LRUCache(Cache):
+    """
+    In-process cache holding at most max_entries items and, if max_bytes is
+    set, at most that many bytes of str/bytes values.
+    """
+
+    def __init__(self, max_entries=256, ttl=None, max_bytes=None):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _sizeof(entry):
+        value = entry[1]
+        if isinstance(value, str):
+            return len(value.encode("utf-8"))
+        if isinstance(value, bytes):
+            return len(value)
+        return 0
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= self._sizeof(entry)
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            value = self._unwrap(entry)
+            if value is None:
+                self._pop(key)
+            else:
+                self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, entry):
+        size = self._sizeof(entry)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = entry
+            self.size_bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.size_bytes > self.max_bytes
+            ):
+                self._pop(next(iter(self._entries)))
+
+    def stats(self):
+        return {**super().stats(), "entries": len(self._entries), "bytes": self.size_bytes}
+
+
+class SharedDictCache(Cache):
+    """
+    Cache on a shared key-value store such as a modal.Dict, so every container
+    sees the same entries. The store only needs get(key) and put(key, value).
+    """
+
+    def __init__(self, store, ttl=None):
+        super().__init__(ttl)
+        self.store = store
+
+    def _get(self, key):
+        return self._unwrap(self.store.get(key))
+
+    def _set(self, key, entry):
+        self.store.put(key, entry)
+
+
+class DirectoryCache(Cache):
+    """
+    Cache stored as one file per key under a directory, e.g. a mounted
+    modal.Volume so entries survive container restarts. For a volume, pass
+    its commit and reload: writes are committed so other containers can see
+    them, and a miss reloads the volume (at most every reload_interval
+    seconds) to pick up what other containers have written.
+    """
+
+    def __init__(self, directory, ttl=None, commit=None, reload=None, reload_interval=10.0):
+        super().__init__(ttl)
+        self.directory = directory
+        self.commit = commit
+        self.reload = reload
+        self.reload_interval = reload_interval
+        self._reloaded_at = time.monotonic()
+        self._sync_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, content_hash(key))
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return self._unwrap(pickle.load(f))
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _get(self, key):
+        value = self._read(key)
+        if value is None and self.reload and self._sync(reloading=True):
+            value = self._read(key)
+        return value
+
+    def _set(self, key, entry):
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(entry, f)
+        os.replace(tmp_path, self._path(key))
+        if self.commit:
+            self._sync(reloading=False)
+
+    def _sync(self, reloading):
+        """Commits, or reloads if one is due; returns whether it happened. Failures only cost sharing."""
+        with self._sync_lock:
+            if reloading and time.monotonic() - self._reloaded_at < self.reload_interval:
+                return False
+            try:
+                if reloading:
+                    self._reloaded_at = time.monotonic()
+                    self.reload()
+                else:
+                    self.commit()
+            except Exception as e:
+                print(f"Cache directory {'reload' if reloading else 'commit'} failed: {e}")
+                return False
+            return True
+
+
+class TieredCache(Cache):
+    """
+    Looks keys up in each cache in turn (fastest first) and copies hits into
+    the faster tiers; writes go to every tier.
+    """
+
+    def __init__(self, *tiers):
+        super().__init__()
+        self.tiers = tiers
+
+    def _get(self, key):
+        for index, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster in self.tiers[:index]:
+                    faster.set(key, value)
+                return value
+        return None
+
+    def set(self, key, value):
+        for tier in self.tiers:
+            tier.set(key, value)
@@ -0,0 +1,207 @@
+"""Prometheus-style latency histograms and counters shared by the Gradio app and the Modal agent."""
+import json
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds, from sub-millisecond stages up to a slow generation
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0,
+)
+
+# Share of requests whose timing line is printed; histograms always see every request
+TIMING_LOG_SAMPLE_RATE = float(os.environ.get("ADVISOR_TIMING_LOG_SAMPLE_RATE", 1.0))
+
+
+def should_log():
+    return TIMING_LOG_SAMPLE_RATE >= 1 or random.random() < TIMING_LOG_SAMPLE_RATE
+
+
+class Histogram:
+    """
+    Histogram of observations per label set, exported in the Prometheus text
+    format. Snapshots from several processes can be merged, so containers that
+    each hold their own histogram can be reported as one.
+    """
+
+    def __init__(self, name, help_text, label_names=("component", "stage"), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _new_series(self):
+        return [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = self._new_series()
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """JSON-safe copy of every series, for publishing or merging."""
+        with self._lock:
+            return [[list(labels), list(counts), total, count] for labels, (counts, total, count) in self._series.items()]
+
+    def merge(self, snapshot):
+        """Adds the series of another histogram's snapshot to this one."""
+        with self._lock:
+            for labels, counts, total, count in snapshot:
+                series = self._series.get(tuple(labels))
+                if series is None:
+                    series = self._series[tuple(labels)] = self._new_series()
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+                series[2] += count
+
+    def quantile(self, q, *label_values):
+        """
+        Estimates the q-quantile from the buckets, interpolating linearly inside
+        the bucket the way Prometheus' histogram_quantile does.
+        """
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None or not series[2]:
+                return None
+            counts, count = list(series[0]), series[2]
+        rank = q * count
+        seen = 0
+        for i, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def summary(self, quantiles=(0.5, 0.95, 0.99)):
+        """{"component/stage": {"count", "mean", "p50", ...}} with quantiles in seconds."""
+        with self._lock:
+            series = {labels: (total, count) for labels, (_, total, count) in self._series.items()}
+        report = {}
+        for labels, (total, count) in sorted(series.items()):
+            row = {"count": count, "mean": total / count if count else None}
+            for q in quantiles:
+                row[f"p{round(q * 100)}"] = self.quantile(q, *labels)
+            report["/".join(labels)] = row
+        return report
+
+    def exposition(self):
+        """The histogram in the Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items())
+        for labels, counts, total, count in series:
+            label_text = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter:
+    """Count per label set, exported in the Prometheus text format; snapshots merge like Histogram's."""
+
+    def __init__(self, name, help_text, label_names=("component", "reason")):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._counts[label_values] = self._counts.get(label_values, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(labels), count] for labels, count in self._counts.items()]
+
+    def merge(self, snapshot):
+        for labels, count in snapshot:
+            self.inc(*labels, amount=count)
+
+    def summary(self):
+        """{"component/reason": count}"""
+        with self._lock:
+            return {"/".join(labels): count for labels, count in sorted(self._counts.items())}
+
+    def exposition(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            counts = sorted(self._counts.items())
+        for labels, count in counts:
+            label_text = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{label_text}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+# Seconds spent in each stage of a request, labelled by the process part and stage name
+stage_seconds = Histogram("advisor_stage_seconds", "Time spent in each stage of an advice request.")
+# Requests and model calls stopped early because nobody was waiting for them any more
+abandoned_work = Counter(
+    "advisor_abandoned_total", "Requests and model calls given up on, by component and reason."
+)
+
+
+@contextmanager
+def timed(component, stage, histogram=stage_seconds):
+    """Observes the time spent in the block, for stages outside a StageTimer."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, component, stage)
+
+
+def metrics_summary(histogram=stage_seconds, counter=abandoned_work):
+    """{"stages": count, mean and p50/p95/p99 per stage, "abandoned": count per component and reason}"""
+    return {"stages": histogram.summary(), "abandoned": counter.summary()}
+
+
+def start_metrics_server(port, histogram=stage_seconds, counter=abandoned_work):
+    """
+    Serves /metrics (Prometheus text) and /metrics.json (metrics_summary)
+    from a daemon thread.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body = (histogram.exposition() + counter.exposition()).encode()
+                content_type = "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = json.dumps(metrics_summary(histogram, counter)).encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics on http://0.0.0.0:{port}/metrics")
+    return server
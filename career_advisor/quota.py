@@ -0,0 +1,192 @@
+"""
+Admission control for Gemini calls: token buckets for the requests-per-minute
+and tokens-per-minute quotas, a priority queue with bounded waits, and a
+concurrency limit that adapts to rate limiting and latency.
+"""
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+# Priorities, lowest first out of the queue
+INTERACTIVE = 0
+BATCH = 1
+
+
+class QuotaExceeded(Exception):
+    """Raised when a call waited longer than its priority allows for quota."""
+
+    def __init__(self, message, retry_after):
+        # Both go in args so the exception survives pickling, e.g. out of a .remote() call
+        super().__init__(message, retry_after)
+        self.message = message
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return self.message
+
+
+class TokenBucket:
+    """
+    Holds up to burst_seconds' worth of a per-minute quota and refills at the
+    rest of it, so no 60-second window sees more than per_minute taken.
+    """
+
+    def __init__(self, per_minute, burst_seconds=10.0):
+        self.capacity = per_minute * burst_seconds / 60
+        self.rate = (per_minute - self.capacity) / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, reserve=0.0):
+        """Seconds until amount can be taken while leaving reserve in the bucket."""
+        missing = amount + reserve - self.level
+        return max(0.0, missing / self.rate) if self.rate else 0.0
+
+
+class QuotaScheduler:
+    """
+    Admits calls that fit both quotas, in priority then arrival order. Batch
+    calls may not use the last batch_reserve share of either bucket, which
+    is kept for interactive calls. The concurrency limit is halved on every
+    rate-limit error (calls also pause for a backoff that grows with repeated
+    errors) and otherwise grows by one per limit's worth of successful calls,
+    shrinking slightly instead when calls are slower than latency_target.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute,
+        tokens_per_minute,
+        max_concurrency=32,
+        max_wait=None,
+        batch_reserve=0.2,
+        latency_target=None,
+        throttle_errors=(),
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.max_wait = max_wait or {INTERACTIVE: 30.0, BATCH: 300.0}
+        self.batch_reserve = batch_reserve
+        self.latency_target = latency_target
+        self.throttle_errors = tuple(throttle_errors)
+        self.active = 0
+        self.paused_until = 0.0
+        self.throttle_streak = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.throttled = 0
+        self._waiting = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+
+    def _wait_time(self, now, tokens, priority):
+        if priority == INTERACTIVE:
+            request_reserve = token_reserve = 0.0
+        else:
+            request_reserve = self.requests.capacity * self.batch_reserve
+            token_reserve = self.tokens.capacity * self.batch_reserve
+        return max(
+            self.paused_until - now,
+            self.requests.wait_time(1, request_reserve),
+            self.tokens.wait_time(tokens, token_reserve),
+        )
+
+    def _acquire(self, tokens, priority, timeout):
+        # A prompt larger than the bucket could never be admitted; let it drain the bucket instead
+        tokens = min(tokens, self.tokens.capacity * (1 - self.batch_reserve))
+        entry = (priority, next(self._order))
+        max_wait = self.max_wait[priority] if timeout is None else min(timeout, self.max_wait[priority])
+        deadline = time.monotonic() + max_wait
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    timeout = deadline - now
+                    if self._waiting[0] == entry and self.active < int(self.limit):
+                        self.requests.refill(now)
+                        self.tokens.refill(now)
+                        wait = self._wait_time(now, tokens, priority)
+                        if wait <= 0:
+                            self.requests.level -= 1
+                            self.tokens.level -= tokens
+                            self.active += 1
+                            self.admitted += 1
+                            return
+                        timeout = min(timeout, wait)
+                    if deadline <= now:
+                        self.rejected += 1
+                        raise QuotaExceeded(
+                            f"No Gemini quota within {max_wait:.0f}s", retry_after=self._retry_after(now)
+                        )
+                    self._condition.wait(timeout)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+    def _retry_after(self, now):
+        """Rough seconds until a request could be admitted again, for Retry-After."""
+        return max(1.0, self.paused_until - now, self.requests.wait_time(1))
+
+    def _release(self, seconds=None, throttled=False):
+        with self._condition:
+            self.active -= 1
+            if throttled:
+                self.throttled += 1
+                self.throttle_streak += 1
+                self.limit = max(1.0, self.limit / 2)
+                self.paused_until = time.monotonic() + min(60.0, 2.0 ** self.throttle_streak)
+            elif seconds is not None:
+                self.throttle_streak = 0
+                if self.latency_target and seconds > self.latency_target:
+                    self.limit = max(1.0, self.limit * 0.9)
+                else:
+                    self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, tokens, priority=INTERACTIVE, timeout=None):
+        """
+        Waits until a call estimated at tokens (input plus output) fits the
+        quotas, then runs the block as one call. Raises QuotaExceeded if the
+        wait would exceed max_wait[priority] or timeout. Errors in
+        throttle_errors raised by the block count as rate limiting.
+        """
+        self._acquire(tokens, priority, timeout)
+        started = time.monotonic()
+        try:
+            yield
+        except self.throttle_errors:
+            self._release(throttled=True)
+            raise
+        except BaseException:
+            self._release()
+            raise
+        self._release(time.monotonic() - started)
+
+    def refund(self, tokens):
+        """Returns tokens estimated for a call that turned out to use fewer (negative to charge more)."""
+        with self._condition:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + tokens)
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "limit": round(self.limit, 2),
+                "active": self.active,
+                "queued": len(self._waiting),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "throttled": self.throttled,
+            }
+
@@ -0,0 +1,374 @@
+"""
+HTML rendering of the advice sections shown in the Gradio app.
+
+Each card's markup lives in one template function below (an f-string compiled
+with the module), and the patterns that pick the Markdown apart are compiled
+at import. Markdown sections are HTML-escaped once as a whole before they are
+scanned (none of the markers the parsers look for contain &, < or >), and each
+section is assembled with a single join. Markdown sections (format_sections)
+and structured advice (format_advice) share the same templates.
+"""
+import os
+import re
+from html import escape
+
+from .advice_schema import stars
+from .cache import LRUCache, content_hash
+from .sections import SECTION_KEYS
+
+# Rendered sections keyed by a hash of their Markdown, so repeated advice and
+# every re-render while a response streams in cost one lookup per section
+render_cache = LRUCache(
+    max_entries=int(os.environ.get("ADVISOR_RENDER_CACHE_SIZE", 4096)),
+    max_bytes=int(os.environ.get("ADVISOR_RENDER_CACHE_MAX_BYTES", 16 * 1024 * 1024)),
+)
+
+# Templates; every argument must already be HTML-escaped
+
+def summary_card(lines):
+    return (
+        '<div class="expandable-card expanded">\n'
+        '<div class="card-header">\n'
+        '<div class="card-title">Quick Summary</div>\n'
+        '<div class="expand-icon">▼</div>\n'
+        '</div>\n'
+        f'<div class="card-content">\n{lines}</div>\n'
+        '</div>'
+    )
+
+
+def summary_line(text):
+    return f'<div class="content-line">{text}</div>\n'
+
+
+def role_card(name, score, details):
+    return f'<div class="role-card">\n<div class="role-title">{name} (Match Score: {score})</div>\n{details}</div>\n'
+
+
+def role_detail(label, value):
+    return f'<div class="role-detail"><strong>{label}:</strong> {value}</div>\n'
+
+
+def role_note(text):
+    return f'<div class="role-detail">{text}</div>\n'
+
+
+def skill_bars(bars):
+    return f'<div class="skill-bars">\n{bars}</div>\n'
+
+
+def skill_bar(name, pct):
+    return (
+        '<div class="skill-bar">\n'
+        f'<div class="skill-name">{name}</div>\n'
+        '<div class="progress-bar">\n'
+        f'<div class="progress" style="width: {pct}%; background-color: #3498db;"></div>\n'
+        '</div>\n'
+        f'<div class="percentage">{pct}%</div>\n'
+        '</div>\n'
+    )
+
+
+def learning_card(month_range, details):
+    return f'<div class="learning-card">\n<div class="month-range">{month_range}</div>\n{details}</div>\n'
+
+
+def course_line(text):
+    return f'<div class="course-name">📚 Course: {text}</div>\n'
+
+
+def project_line(text):
+    return f'<div class="project-name">💻 Project: {text}</div>\n'
+
+
+def outcome_line(text):
+    return f'<div class="outcome">🎯 Expected Outcome: {text}</div>\n'
+
+
+def project_card(project='Project', difficulty='⭐⭐⭐', duration='2 weeks', skills='Various skills',
+                 description='Project description'):
+    return (
+        '<div class="project-card">\n'
+        f'<div>{project}</div>\n'
+        f'<div><strong>Difficulty:</strong> {difficulty}</div>\n'
+        f'<div><strong>Duration:</strong> {duration}</div>\n'
+        f'<div><strong>Skills:</strong> {skills}</div>\n'
+        f'<div><strong>Description:</strong> {description}</div>\n'
+        '</div>\n'
+    )
+
+
+def cert_card(name, details):
+    return f'<div class="cert-card">\n<div class="cert-name">{name}</div>\n{details}</div>\n'
+
+
+def cert_detail(label, value):
+    return f'<div class="cert-detail">- {label}: {value}</div>\n'
+
+
+def cert_note(text):
+    return f'<div class="cert-detail">• {text}</div>\n'
+
+
+NO_CERTIFICATIONS = '<div class="cert-card"><div class="cert-name">No certifications found</div></div>'
+
+# Patterns over whole (escaped) sections
+
+# Roles and learning steps are numbered "1." to "3."
+NUMBERED_ITEM = ('1.', '2.', '3.')
+# "- Label: value" lines under a role; other "- ..." lines are shown as notes
+ROLE_MARKERS = tuple((label, label + ':') for label in ('Salary Range', 'Key Requirements', 'Why It Fits'))
+LEARNING_MARKERS = (('Course:', course_line), ('Project:', project_line), ('Expected Outcome:', outcome_line))
+PERCENTAGE = re.compile(r'(\d+)%')
+PROJECT_FIELDS = {'Project': 'project', 'Difficulty': 'difficulty', 'Duration': 'duration', 'Skills': 'skills',
+                  'Description': 'description'}
+# Certification details, which follow the certification's own "- Name" line
+CERT_LABELS = {'difficulty level': 'Difficulty Level', 'time commitment': 'Time Commitment', 'cost range': 'Cost Range'}
+CERT_DETAIL_LINE = re.compile(r'difficulty level|time commitment|cost range', re.IGNORECASE)
+CERT_DETAIL = re.compile(r'(difficulty level|time commitment|cost range):', re.IGNORECASE)
+
+
+def render_summary(content):
+    lines = [summary_line(line) for line in escape(content, quote=False).split('\n') if line.strip()]
+    return summary_card(''.join(lines))
+
+
+def _skill_block(body):
+    parts = []
+    for line in body.split('\n'):
+        if '[' in line and ']' in line:
+            name, _, rest = line.partition('[')
+            match = PERCENTAGE.search(rest)
+            if match:
+                parts.append(skill_bar(name.strip(), int(match.group(1))))
+        elif line:
+            parts.append(line + '\n')
+    return skill_bars(''.join(parts))
+
+
+def _project_block(body):
+    fields = {}
+    for line in body.split('\n'):
+        key, sep, value = line.partition(':')
+        key = key.strip()
+        if sep and key in PROJECT_FIELDS:
+            fields[PROJECT_FIELDS[key]] = value.strip()
+    return project_card(**fields) if fields else ''
+
+
+def _line_end(text, index):
+    """Index just past the line containing index."""
+    end = text.find('\n', index)
+    return len(text) if end < 0 else end + 1
+
+
+def _render_blocks(text, kind, render_block):
+    """
+    Renders the ```kind fenced blocks of text with render_block; the fence
+    lines are dropped and text outside the blocks passes through.
+    """
+    parts = []
+    position = 0
+    opener = '```' + kind
+    while (start := text.find(opener, position)) >= 0:
+        body_start = _line_end(text, start)
+        close = text.find('```', body_start)
+        if close < 0:
+            body_end = end = len(text)
+        else:
+            body_end = text.rfind('\n', 0, close) + 1
+            end = _line_end(text, close)
+        parts.append(text[position:text.rfind('\n', 0, start) + 1])
+        parts.append(render_block(text[body_start:body_end]))
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts)
+
+
+def render_skill_bars(text):
+    """Turns ```skill-meter blocks into progress bars; other lines pass through."""
+    return _render_blocks(escape(text, quote=False), 'skill-meter', _skill_block)
+
+
+def render_project_cards(text):
+    """Turns ```project-card blocks into cards; other lines pass through."""
+    return _render_blocks(escape(text, quote=False), 'project-card', _project_block)
+
+
+def _numbered_items(content):
+    """Groups lines into numbered items; lines before the first item are dropped."""
+    items = []
+    for line in content.split('\n'):
+        if line.lstrip().startswith(NUMBERED_ITEM):
+            items.append([line])
+        elif items:
+            items[-1].append(line)
+    return items
+
+
+def _role_card(lines):
+    title = lines[0]
+    name = score = ''
+    if '**' in title:
+        name = title.split('**')[1].strip()
+        if '(Match Score:' in title:
+            score = title.split('(Match Score:')[1].split(')')[0].strip()
+    details = []
+    for line in lines[1:]:
+        line = line.strip()
+        if not line.startswith('-'):
+            continue
+        detail = line[1:].strip()
+        for label, marker in ROLE_MARKERS:
+            if marker in detail:
+                details.append(role_detail(label, detail.split(marker, 1)[1].strip()))
+                break
+        else:
+            details.append(role_note(detail))
+    return role_card(name, score, ''.join(details))
+
+
+def render_roles(content):
+    return ''.join([_role_card(lines) for lines in _numbered_items(escape(content, quote=False))])
+
+
+def _learning_card(lines):
+    month_range = lines[0].split(':', 1)[0].replace('*', '').strip()
+    details = []
+    for line in lines:
+        for marker, template in LEARNING_MARKERS:
+            if marker in line:
+                details.append(template(line.split(marker, 1)[1].strip().strip('"')))
+                break
+    return learning_card(month_range, ''.join(details))
+
+
+def render_learning(content):
+    return ''.join([_learning_card(lines) for lines in _numbered_items(escape(content, quote=False))])
+
+
+def parse_certifications(content):
+    """Groups certification lines into [name, detail, ...] lists, for either layout the model uses."""
+    lines = [line.strip() for line in content.split('\n')]
+    groups = []
+    if any(line.startswith('- ') for line in lines):
+        # "- Name" lines followed by "- Difficulty Level: ..." style details
+        for line in lines:
+            if not line.startswith('- '):
+                continue
+            if CERT_DETAIL_LINE.search(line):
+                if groups:
+                    groups[-1].append(line)
+            else:
+                groups.append([line[2:].strip()])
+    else:
+        # "* Name" lines followed by free-form details
+        for line in lines:
+            if line.startswith('*'):
+                groups.append([line])
+            elif groups and line:
+                groups[-1].append(line)
+    return groups
+
+
+def _certification_card(lines):
+    details = []
+    for line in lines[1:]:
+        line = line.strip('*- ')
+        if not line:
+            continue
+        match = CERT_DETAIL.search(line)
+        if match:
+            details.append(cert_detail(CERT_LABELS[match.group(1).lower()], line.split(':', 1)[1].strip()))
+        else:
+            details.append(cert_note(line))
+    return cert_card(lines[0].replace('*', '').strip(), ''.join(details))
+
+
+def render_certifications(content):
+    groups = parse_certifications(escape(content, quote=False))
+    return ''.join([_certification_card(lines) for lines in groups]) or NO_CERTIFICATIONS
+
+
+SECTION_RENDERERS = {
+    'summary': render_summary,
+    'roles': render_roles,
+    'skills': render_skill_bars,
+    'learning': render_learning,
+    'projects': render_project_cards,
+    'certifications': render_certifications,
+}
+
+
+def render_section(key, content):
+    """Renders one Markdown section, reusing the markup from render_cache when the text was seen before."""
+    renderer = SECTION_RENDERERS.get(key)
+    if renderer is None:
+        return content
+    cache_key = content_hash(f"{key}\x1f{content}")
+    markup = render_cache.get(cache_key)
+    if markup is None:
+        markup = renderer(content)
+        render_cache.set(cache_key, markup)
+    return markup
+
+
+def format_sections(sections):
+    """
+    Renders each Markdown section as HTML markup. The stylesheet and scripts
+    they rely on are registered once on the Blocks (see app.py).
+    """
+    return {key: render_section(key, content) for key, content in sections.items()}
+
+
+def format_outputs(sections):
+    """Renders sections and returns them in the order of the output components."""
+    formatted = format_sections(sections)
+    return [formatted[key] for key in SECTION_KEYS]
+
+
+def format_advice(advice):
+    """
+    Renders structured (JSON mode) advice straight from its typed fields, in
+    the order of the output components. No Markdown is scanned on this path.
+    """
+    roles = [
+        role_card(escape(role.title), f"{role.match_score}/10", (
+            role_detail('Salary Range', escape(role.salary_range))
+            + role_detail('Key Requirements', escape(', '.join(role.key_requirements)))
+            + role_detail('Why It Fits', escape(role.why_it_fits))
+        ))
+        for role in advice.roles
+    ]
+    learning = [
+        learning_card(escape(f"{step.months}: {step.focus}" if step.focus else step.months), (
+            course_line(escape(step.course))
+            + project_line(escape(step.project))
+            + outcome_line(escape(step.expected_outcome))
+        ))
+        for step in advice.learning_path
+    ]
+    projects = [
+        project_card(
+            escape(project.name), stars(project.difficulty), escape(project.duration),
+            escape(', '.join(project.skills)), escape(project.description),
+        )
+        for project in advice.projects
+    ]
+    certifications = [
+        cert_card(escape(f"{cert.name} ({cert.provider})" if cert.provider else cert.name), (
+            cert_detail('Difficulty Level', stars(cert.difficulty))
+            + cert_detail('Time Commitment', escape(cert.time_commitment))
+            + cert_detail('Cost Range', escape(cert.cost_range))
+        ))
+        for cert in advice.certifications
+    ]
+    formatted = {
+        'summary': render_summary(advice.summary),
+        'roles': ''.join(roles),
+        'skills': skill_bars(''.join([skill_bar(escape(skill.name), skill.percentage) for skill in advice.skills])),
+        'learning': ''.join(learning),
+        'projects': ''.join(projects),
+        'certifications': ''.join(certifications) or NO_CERTIFICATIONS,
+    }
+    return [formatted[key] for key in SECTION_KEYS]
@@ -0,0 +1,250 @@
+"""Resume text extraction, shared by the Gradio app and the Modal agent."""
+import io
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Stop extracting once this many characters have been collected
+MAX_RESUME_CHARS = int(os.environ.get("ADVISOR_RESUME_MAX_CHARS", 100_000))
+# PDFs with at least this many pages are split across worker processes
+PARALLEL_MIN_PAGES = int(os.environ.get("ADVISOR_RESUME_PARALLEL_MIN_PAGES", 32))
+# Rough size of the resume sent to the model, see condense_resume
+RESUME_TOKEN_BUDGET = int(os.environ.get("ADVISOR_RESUME_TOKEN_BUDGET", 3000))
+PAGE_WORKERS = int(os.environ.get("ADVISOR_RESUME_PAGE_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Separates PDF pages in extracted text, so condense_resume can find running headers and footers
+PAGE_BREAK = "\f"
+
+# PyMuPDF is not thread-safe, so long PDFs are split across processes
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+
+def process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Process pool for resume parsing. Workers come from a fork server rather
+    than forking the caller, whose other threads (thread pools, gRPC) could
+    hold a lock at the moment of the fork and leave it held in the child.
+    The fork server imports the parsing libraries once, so workers start
+    with them loaded.
+    """
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__, "fitz", "docx"])
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+
+def _get_page_pool():
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            _page_pool = process_pool(PAGE_WORKERS)
+    return _page_pool
+
+
+def iter_pdf_pages(file_content: bytes, start: int = 0, stop: int = None):
+    """Yields the text of each page in [start, stop) of a PDF."""
+    import fitz  # PyMuPDF
+
+    with fitz.open(stream=file_content, filetype="pdf") as pdf_document:
+        stop = pdf_document.page_count if stop is None else min(stop, pdf_document.page_count)
+        for page_number in range(start, stop):
+            yield pdf_document.load_page(page_number).get_text()
+
+
+def _collect(pages, max_chars):
+    """Joins page texts, stopping once max_chars have been collected."""
+    parts = []
+    total = 0
+    for text in pages:
+        parts.append(text)
+        total += len(text)
+        if max_chars and total >= max_chars:
+            break
+    return parts
+
+
+def _extract_pdf_range(file_content: bytes, start: int, stop: int, max_chars: int):
+    return PAGE_BREAK.join(_collect(iter_pdf_pages(file_content, start, stop), max_chars))
+
+
+def extract_pdf_text(file_content: bytes, max_chars: int = MAX_RESUME_CHARS, workers: int = PAGE_WORKERS) -> str:
+    import fitz  # PyMuPDF
+
+    with fitz.open(stream=file_content, filetype="pdf") as pdf_document:
+        page_count = pdf_document.page_count
+
+    if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+        text = PAGE_BREAK.join(_collect(iter_pdf_pages(file_content), max_chars))
+    else:
+        # Contiguous page ranges, one per worker, reassembled in order
+        step = -(-page_count // workers)
+        futures = [
+            _get_page_pool().submit(_extract_pdf_range, file_content, start, start + step, max_chars)
+            for start in range(0, page_count, step)
+        ]
+        text = PAGE_BREAK.join(_collect((future.result() for future in futures), max_chars))
+    return text[:max_chars] if max_chars else text
+
+
+def iter_docx_paragraphs(file_content: bytes):
+    """
+    Yields the text of every paragraph in document order, including those in
+    tables and text boxes.
+    """
+    import docx
+    from docx.oxml.ns import qn
+    from docx.text.paragraph import Paragraph
+
+    doc = docx.Document(io.BytesIO(file_content))
+    fallback_tag = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+    for element in doc.element.body.iter(qn("w:p")):
+        # Text boxes are stored twice (DrawingML and a VML fallback); keep one copy
+        if any(ancestor.tag == fallback_tag for ancestor in element.iterancestors()):
+            continue
+        yield Paragraph(element, doc).text
+
+
+def extract_docx_text(file_content: bytes, max_chars: int = MAX_RESUME_CHARS) -> str:
+    text = "".join(_collect((line + "\n" for line in iter_docx_paragraphs(file_content)), max_chars))
+    return text[:max_chars] if max_chars else text
+
+
+def parse_resume(file_content: bytes, filename: str, max_chars: int = MAX_RESUME_CHARS) -> str:
+    """Parses text from PDF or DOCX files."""
+    text = ""
+    try:
+        if filename.lower().endswith(".pdf"):
+            text = extract_pdf_text(file_content, max_chars)
+        elif filename.lower().endswith(".docx"):
+            text = extract_docx_text(file_content, max_chars)
+    except Exception as e:
+        print(f"Error parsing file {filename}: {e}")
+        return f"Error parsing resume: {e}"
+    return text
+
+
+def parse_resume_file(path: str) -> str:
+    """Parses a resume from disk; runs in a worker process in the Gradio app."""
+    with open(path, "rb") as f:
+        return parse_resume(f.read(), os.path.basename(path))
+
+
+def is_parse_error(text: str) -> bool:
+    return text.startswith("Error parsing resume:")
+
+
+# Resume sections in the order they are kept when trimming to the token budget
+SECTION_PRIORITY = (
+    ("skills", ("skills", "technical skills", "core competencies", "technologies", "tech stack")),
+    ("experience", ("experience", "work experience", "professional experience", "employment",
+                    "employment history", "work history")),
+    ("projects", ("projects", "personal projects", "selected projects")),
+    ("summary", ("summary", "profile", "about me", "objective", "professional summary")),
+    ("certifications", ("certifications", "certificates", "licenses")),
+    ("education", ("education", "academic background")),
+)
+
+BOILERPLATE_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        # Page numbers; up to three digits so years are kept
+        r"^page \d{1,3}( of \d{1,3})?$",
+        r"^\d{1,3}$",
+        r"^-\s*\d{1,3}\s*-$",
+        r"^(curriculum vitae|resume|résumé)$",
+        r"^references (are )?available (up)?on request\.?$",
+        r"^confidential$",
+    )
+]
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for Gemini-style tokenizers (about 4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+# Lines this close to a page break are candidates for running headers and footers
+PAGE_EDGE_LINES = 3
+
+
+def _running_lines(text: str) -> set:
+    """
+    Casefolded lines found near the top or bottom of at least half of the
+    pages (and at least two), i.e. running headers and footers.
+    """
+    pages = text.split(PAGE_BREAK)
+    if len(pages) < 2:
+        return set()
+    counts = {}
+    for page in pages:
+        lines = [" ".join(line.split()).casefold() for line in page.splitlines()]
+        lines = [line for line in lines if line]
+        for line in set(lines[:PAGE_EDGE_LINES] + lines[-PAGE_EDGE_LINES:]):
+            counts[line] = counts.get(line, 0) + 1
+    return {line for line, count in counts.items() if count >= max(2, len(pages) / 2)}
+
+
+def _section_of(line: str):
+    heading = line.strip().rstrip(":").casefold()
+    if len(heading) > 40:
+        return None
+    for section, names in SECTION_PRIORITY:
+        if heading in names:
+            return section
+    return None
+
+
+def condense_resume(text: str, token_budget: int = RESUME_TOKEN_BUDGET) -> str:
+    """
+    Shrinks extracted resume text before it goes into the prompt: normalizes
+    whitespace, drops page numbers, boilerplate and repeats of running page
+    headers and footers, then trims to token_budget keeping skills and
+    experience first. Other repeated lines (a second job with the same
+    title) are kept.
+    """
+    lines = []
+    running = _running_lines(text)
+    # Running lines are kept once, e.g. the name and contact line of a header
+    seen_running = set()
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        key = line.casefold()
+        if not line:
+            # Collapse runs of blank lines
+            if lines and lines[-1]:
+                lines.append(line)
+            continue
+        if key in seen_running or any(pattern.match(line) for pattern in BOILERPLATE_PATTERNS):
+            # Repeated section headings still mark where a section continues
+            if _section_of(line):
+                lines.append((_section_of(line),))
+            continue
+        if key in running:
+            seen_running.add(key)
+        lines.append(line)
+
+    condensed = "\n".join(line for line in lines if isinstance(line, str)).strip()
+    if estimate_tokens(condensed) <= token_budget:
+        return condensed
+
+    # Over budget: regroup by section and keep the most useful sections first
+    sections = {}
+    current = "other"
+    for line in lines:
+        if isinstance(line, tuple):
+            current = line[0]
+            continue
+        current = _section_of(line) or current
+        sections.setdefault(current, []).append(line)
+    order = [section for section, _ in SECTION_PRIORITY] + ["other"]
+
+    budget_chars = token_budget * 4
+    parts = []
+    for section in order:
+        if section not in sections or budget_chars <= 0:
+            continue
+        block = "\n".join(sections[section]).strip()
+        parts.append(block[:budget_chars])
+        budget_chars -= len(block) + 2
+    return "\n\n".join(parts).strip()
@@ -0,0 +1,104 @@
+"""Splitting the agent's Markdown response into the sections shown in the UI."""
+
+# Output order of the Gradio components, one per section of the advice
+SECTION_KEYS = ["summary", "roles", "skills", "learning", "projects", "certifications"]
+
+# Line prefixes that start a section; None marks the roadmap section, which is skipped
+SECTION_HEADINGS = (
+    ('### 💫', 'summary'),
+    ('### 🎯', 'roles'),
+    ('### 📊', 'skills'),
+    ('### 📚', 'learning'),
+    ('### 💡', 'projects'),
+    ('### 🎓', 'certifications'),
+    ('### 🗺️', None),
+)
+
+HEADING_PREFIXES = tuple(prefix for prefix, _ in SECTION_HEADINGS)
+
+
+class SectionParser:
+    """
+    Push-based parser for the agent's Markdown.
+
+    Feed it text chunks as they arrive; it keeps the heading state machine
+    and the lines of the section being written, so the whole response is
+    scanned once no matter how many times the finished sections are read.
+    """
+
+    def __init__(self):
+        self._sections = {key: '' for key in SECTION_KEYS}
+        self._finished = set()
+        self._current_section = None
+        self._current_lines = []
+        self._partial_line = []
+
+    def feed(self, chunk):
+        """Add a chunk of text. Returns True if a section was finished by it."""
+        pieces = chunk.split('\n')
+        if len(pieces) == 1:
+            self._partial_line.append(chunk)
+            return False
+
+        finished_before = len(self._finished)
+        self._partial_line.append(pieces[0])
+        self._process_line(''.join(self._partial_line))
+        for line in pieces[1:-1]:
+            self._process_line(line)
+        self._partial_line = [pieces[-1]]
+        return len(self._finished) != finished_before
+
+    def flush_section(self):
+        """
+        Show the section being written as finished, for streams whose chunks
+        each end with a whole section. Lines fed after it still belong to that
+        section. Returns True if there was anything to show.
+        """
+        key = self._current_section
+        if key is None or not self._current_lines:
+            return False
+        self._sections[key] = '\n'.join(self._current_lines)
+        self._finished.add(key)
+        return True
+
+    def close(self):
+        """Flush the last line and section and return all sections."""
+        self._process_line(''.join(self._partial_line))
+        self._partial_line = []
+        self._finish_section()
+        return dict(self._sections)
+
+    def finished_sections(self):
+        """Sections whose heading and content are complete; the rest are empty."""
+        return {
+            key: self._sections[key] if key in self._finished else ''
+            for key in SECTION_KEYS
+        }
+
+    def _process_line(self, line):
+        if line.startswith(HEADING_PREFIXES):
+            self._finish_section()
+            for prefix, key in SECTION_HEADINGS:
+                if line.startswith(prefix):
+                    self._current_section = key
+                    break
+        elif self._current_section:
+            self._current_lines.append(line)
+
+    def _finish_section(self):
+        key = self._current_section
+        if key is None:
+            return
+        # A repeated heading without content keeps the earlier text
+        if self._current_lines:
+            self._sections[key] = '\n'.join(self._current_lines)
+        self._finished.add(key)
+        self._current_section = None
+        self._current_lines = []
+
+
+def extract_sections(markdown_text):
+    """Extract different sections from the markdown response"""
+    parser = SectionParser()
+    parser.feed(markdown_text)
+    return parser.close()
@@ -0,0 +1,258 @@
+"""
+Coalescing of identical in-flight requests: the first caller for a key does
+the work and concurrent callers with the same key share its result, or
+replay its stream from the start and then follow it live. A stream whose
+followers have all gone away is stopped.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class _Broadcast:
+    """Items of one stream, kept so that late followers can replay them."""
+
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.followers = 0
+        self.cancelled = False
+        # Set along with cancelled, for producers blocked between items
+        self.cancel_event = threading.Event()
+        self.condition = threading.Condition()
+
+    def pump(self, items):
+        """Consumes items until they run out or every follower has gone; returns False in the latter case."""
+        try:
+            for item in items:
+                with self.condition:
+                    if self.cancelled:
+                        break
+                    self.items.append(item)
+                    self.condition.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.cancelled and hasattr(items, "close"):
+                items.close()
+            with self.condition:
+                self.done = True
+                self.condition.notify_all()
+        return not self.cancelled
+
+
+class _Follower:
+    """One consumer's iterator over a broadcast. close() may be called from any thread."""
+
+    def __init__(self, broadcast):
+        self.broadcast = broadcast
+        self.index = 0
+        self.closed = False
+        broadcast.followers += 1
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        broadcast = self.broadcast
+        with broadcast.condition:
+            broadcast.condition.wait_for(lambda: self.closed or self.index < len(broadcast.items) or broadcast.done)
+            if self.closed:
+                raise StopIteration
+            if self.index < len(broadcast.items):
+                self.index += 1
+                return broadcast.items[self.index - 1]
+        if broadcast.error is not None:
+            raise broadcast.error
+        raise StopIteration
+
+    def close(self):
+        """Stops following; the stream is cancelled when its last follower leaves before it ends."""
+        broadcast = self.broadcast
+        with broadcast.condition:
+            if self.closed:
+                return
+            self.closed = True
+            broadcast.followers -= 1
+            if not broadcast.followers and not broadcast.done:
+                broadcast.cancelled = True
+                broadcast.cancel_event.set()
+            broadcast.condition.notify_all()
+
+    def __del__(self):
+        self.close()
+
+
+class SingleFlight:
+    """
+    Thread-safe request coalescing. call() shares a function's result and
+    stream() shares an iterator, which is consumed by a background thread
+    so the stream goes on while anyone follows it. on_abandon(key) is called
+    for streams stopped because every follower closed.
+    """
+
+    def __init__(self, on_abandon=None):
+        self._calls = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+        self.on_abandon = on_abandon
+        self.coalesced = 0
+
+    def call(self, key, fn, *args, **kwargs):
+        """
+        Returns (result, shared): fn(*args, **kwargs), or the result of the
+        call already running for key, in which case shared is True.
+        Exceptions are shared the same way.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            shared = future is not None
+            if shared:
+                self.coalesced += 1
+            else:
+                future = self._calls[key] = Future()
+        if shared:
+            return future.result(), True
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result(), False
+
+    def stream(self, key, make_items):
+        """
+        Iterates make_items(cancelled), or follows the stream already running
+        for key. cancelled is a threading.Event set once every follower has
+        closed, so the producer can stop even while it waits for its next
+        item. Close the returned iterator when giving up on it.
+        """
+        with self._lock:
+            broadcast = self._streams.get(key)
+            if broadcast is not None:
+                with broadcast.condition:
+                    if not broadcast.cancelled:
+                        self.coalesced += 1
+                        return _Follower(broadcast)
+            broadcast = self._streams[key] = _Broadcast()
+            follower = _Follower(broadcast)
+        threading.Thread(target=self._pump, args=(key, broadcast, make_items), daemon=True).start()
+        return follower
+
+    def _pump(self, key, broadcast, make_items):
+        try:
+            finished = broadcast.pump(make_items(broadcast.cancel_event))
+        finally:
+            with self._lock:
+                if self._streams.get(key) is broadcast:
+                    del self._streams[key]
+        if not finished and self.on_abandon:
+            self.on_abandon(key)
+
+
+class _AsyncBroadcast:
+    """_Broadcast for async iterators, for use on a single event loop."""
+
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.followers = 0
+        self.cancelled = False
+        self.task = None
+        self.changed = asyncio.Event()
+
+    def _notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def pump(self, items):
+        try:
+            async for item in items:
+                self.items.append(item)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+
+class _AsyncFollower:
+    """One consumer's async iterator over an _AsyncBroadcast."""
+
+    def __init__(self, broadcast):
+        self.broadcast = broadcast
+        self.index = 0
+        self.closed = False
+        broadcast.followers += 1
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        broadcast = self.broadcast
+        while not self.closed:
+            changed = broadcast.changed
+            if self.index < len(broadcast.items):
+                self.index += 1
+                return broadcast.items[self.index - 1]
+            if broadcast.done:
+                if broadcast.error is not None:
+                    raise broadcast.error
+                break
+            await changed.wait()
+        raise StopAsyncIteration
+
+    def close(self):
+        """Stops following; the stream's task is cancelled when its last follower leaves before it ends."""
+        if self.closed:
+            return
+        self.closed = True
+        self.broadcast.followers -= 1
+        if not self.broadcast.followers and not self.broadcast.done:
+            self.broadcast.cancelled = True
+            self.broadcast.task.cancel()
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight.stream for async iterators; the shared stream is consumed
+    by its own task, which is cancelled once every follower has closed.
+    """
+
+    def __init__(self, on_abandon=None):
+        self._streams = {}
+        self._tasks = set()
+        self.on_abandon = on_abandon
+        self.coalesced = 0
+
+    def stream(self, key, make_items):
+        """
+        Iterates make_items(), or follows the stream already running for key.
+        Close the returned iterator when giving up on it.
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is None or broadcast.cancelled:
+            broadcast = self._streams[key] = _AsyncBroadcast()
+            broadcast.task = asyncio.create_task(self._pump(key, broadcast, make_items))
+            # Keep a reference so the task is not garbage collected mid-stream
+            self._tasks.add(broadcast.task)
+            broadcast.task.add_done_callback(self._tasks.discard)
+        else:
+            self.coalesced += 1
+        return _AsyncFollower(broadcast)
+
+    async def _pump(self, key, broadcast, make_items):
+        try:
+            await broadcast.pump(make_items())
+        except asyncio.CancelledError:
+            if self.on_abandon:
+                self.on_abandon(key)
+            raise
+        finally:
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
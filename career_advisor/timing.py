@@ -0,0 +1,67 @@
+"""Per-request stage timings, logged as one line per request and fed to the stage histograms."""
+import time
+from contextlib import contextmanager
+
+from .metrics import should_log, stage_seconds
+
+
+class StageTimer:
+    """
+    Records how long each stage of a request takes. log() adds the stages and
+    the total to the histogram under component (label by default) and prints
+    them for a sample of requests.
+    """
+
+    def __init__(self, label, component=None, histogram=stage_seconds):
+        self.label = label
+        self.component = component or label
+        self.histogram = histogram
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.logged = False
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def mark(self, name):
+        """Records the time since the timer started as name, e.g. time to first output."""
+        if name not in self.durations:
+            self.record(name, time.perf_counter() - self.started)
+
+    def timed_stream(self, chunks, name):
+        """
+        Wraps a generator, recording the time to its first item as "<name>_first"
+        and the time to exhaust it as name, then logs the timings.
+        """
+        start = time.perf_counter()
+        first = True
+        try:
+            for chunk in chunks:
+                if first:
+                    self.record(f"{name}_first", time.perf_counter() - start)
+                    first = False
+                yield chunk
+        finally:
+            self.record(name, time.perf_counter() - start)
+            self.log()
+
+    def log(self):
+        """Finishes the request: observes every stage once and prints the sampled timing line."""
+        if self.logged:
+            return
+        self.logged = True
+        total = time.perf_counter() - self.started
+        for name, seconds in self.durations.items():
+            self.histogram.observe(seconds, self.component, name)
+        self.histogram.observe(total, self.component, "total")
+        if should_log():
+            stages = " ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in self.durations.items())
+            print(f"[timing] {self.label} {stages} total={total * 1000:.1f}ms")
@@ -1,139 +1,557 @@
-import io
+import time
+
+# Taken before anything else is imported, for the cold-start report
+MODULE_STARTED = time.perf_counter()
+
+import asyncio
+import csv
+import functools
+import importlib
+import json
 import os
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional
 
-import docx
-import fitz  # PyMuPDF
 import modal
-import google.generativeai as genai
+# FastAPI's Request is Starlette's; importing it from Starlette keeps FastAPI
+# out of containers that serve no web endpoint
+from starlette.requests import Request
+
+from career_advisor.advice_schema import ADVICE_SCHEMA, parse_advice
+from career_advisor.cache import (
+    DirectoryCache,
+    LRUCache,
+    SharedDictCache,
+    TieredCache,
+    advice_cache_key,
+    content_hash,
+)
+from career_advisor.resume import condense_resume, estimate_tokens, is_parse_error, parse_resume, process_pool
+from career_advisor.sections import HEADING_PREFIXES, SECTION_HEADINGS
+from career_advisor.singleflight import SingleFlight
+from career_advisor.metrics import (
+    Counter,
+    Histogram,
+    abandoned_work,
+    metrics_summary,
+    should_log,
+    stage_seconds,
+    timed,
+)
+from career_advisor.quota import BATCH, INTERACTIVE, QuotaExceeded, QuotaScheduler
+from career_advisor.timing import StageTimer
+
+# Snapshot the memory of containers once the module is imported, so new
+# containers restore it instead of importing again (read at deploy time)
+MEMORY_SNAPSHOT = os.environ.get("ADVISOR_MEMORY_SNAPSHOT", "0") not in ("", "0")
+# Web endpoint containers kept running even without traffic (read at deploy time)
+ENDPOINT_MIN_CONTAINERS = int(os.environ.get("ADVISOR_ENDPOINT_MIN_CONTAINERS", 0))
+# Requests one web_endpoint container serves at once (read at deploy time);
+# they mostly wait on Gemini, so a container takes far more than one.
+# Above ENDPOINT_TARGET_INPUTS Modal prefers starting another container.
+ENDPOINT_MAX_INPUTS = int(os.environ.get("ADVISOR_ENDPOINT_MAX_INPUTS", 100))
+ENDPOINT_TARGET_INPUTS = int(os.environ.get("ADVISOR_ENDPOINT_TARGET_INPUTS", 0)) or None
+
+# Pinned so the image layers stay cached between deploys; pip compiles the
+# packages' bytecode at build time, so containers do not at start
+image = (
+    modal.Image.debian_slim(python_version="3.11")
+    .pip_install(
+        "google-generativeai==0.8.6",
+        # The last release before 1.24, which the resume parser was written against
+        "pymupdf==1.23.26",
+        "python-docx==1.2.0",
+        "fastapi[standard]==0.143.0",
+    )
+    # Containers read these deploy-time settings too: the snapshot setting
+    # (see the imports below), and max inputs to size the endpoint's threads
+    # and Gemini concurrency
+    .env({
+        "ADVISOR_MEMORY_SNAPSHOT": "1" if MEMORY_SNAPSHOT else "0",
+        "ADVISOR_ENDPOINT_MAX_INPUTS": str(ENDPOINT_MAX_INPUTS),
+    })
+    .add_local_python_source("career_advisor")
+)
 
 app = modal.App(
     name="career-advisor-agent-gemini",
-    image=modal.Image.debian_slim().pip_install(
-        "google-generativeai",
-        "pymupdf<1.24.0",
-        "python-docx",
-        "fastapi[standard]"
-    ),
+    image=image,
     secrets=[modal.Secret.from_name("my-google-secret")],
 )
 
-def parse_resume(file_content: bytes, filename: str) -> str:
-    """Parses text from PDF or DOCX files."""
-    text = ""
+# Modules only some code paths need; they are imported on first use
+# (fitz and docx are imported by resume.py's parsing fork server).
+# FastAPI is not among them: Modal's wrapper loads it into every web
+# endpoint container, and other containers never need it.
+DEFERRED_IMPORTS = ("google.generativeai", "google.api_core.exceptions")
+
+
+def lazy_import(name: str):
+    """Imports a module on first use, recording how long the import took."""
+    module = sys.modules.get(name)
+    if module is None:
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        seconds = time.perf_counter() - started
+        stage_seconds.observe(seconds, "cold_start", f"import {name}")
+        print(f"Cold start: imported {name} in {seconds * 1000:.0f} ms")
+    return module
+
+
+def genai():
+    """The google.generativeai module; only generation needs it."""
+    return lazy_import("google.generativeai")
+
+
+def gemini_errors():
+    """(ResourceExhausted, DeadlineExceeded), the Gemini errors we handle."""
+    exceptions = lazy_import("google.api_core.exceptions")
+    return exceptions.ResourceExhausted, exceptions.DeadlineExceeded
+
+
+def report_cold_start():
+    """Prints and records how long loading this module took, and what it left for later."""
+    seconds = time.perf_counter() - MODULE_STARTED
+    stage_seconds.observe(seconds, "cold_start", "module")
+    deferred = [name for name in DEFERRED_IMPORTS if name not in sys.modules]
+    print(f"Cold start: module loaded in {seconds * 1000:.0f} ms, deferred: {', '.join(deferred) or 'nothing'}")
+
+# Bump whenever the prompts change so advice cached for the old prompt is not reused
+PROMPT_VERSION = 2
+
+PROMPT_PREAMBLE = """
+    You are an expert career advisor and coach. Your goal is to provide clear, actionable, and visually structured career advice.
+    {output_format}
+
+    Here is the user's profile:
+    Primary Interest Area: {interest}
+    Bio: {bio}
+    Resume Content: {resume}
+
+    Important Instructions:
+    1. Focus PRIMARILY on the user's chosen interest area ({interest}). All advice should be specifically tailored to this field.
+    2. If a resume is provided, analyze their current skills and experience to provide more personalized recommendations.
+    3. Ensure all recommendations, courses, and projects are SPECIFICALLY relevant to {interest}.
+    4. Use the resume content to identify transferable skills that would be valuable in {interest}.
+"""
+
+# One entry per section of the response, in the order the UI expects them
+SECTION_INSTRUCTIONS = {
+    "summary": """
+    ### 💫 Quick Summary
+    A brief 2-3 sentence overview focusing specifically on their potential in {interest}, highlighting relevant existing skills and clear next steps.
+""",
+    "roles": """
+    ### 🎯 Recommended Roles
+    Present 3 recommended roles IN THE {interest} FIELD ONLY in this format:
+    1. **Role Name** (Match Score: X/10)
+        - Salary Range: $XX,XXX - $XXX,XXX
+        - Key Requirements: req1, req2, req3
+        - Why It Fits: Brief explanation based on their background
+""",
+    "skills": """
+    ### 📊 Skills Assessment
+    Analyze their current skills relevant to {interest}. Use this format:
+    ```skill-meter
+    Current Skills Relevant to {interest}:
+    Skill Name     [█████░░░░░] 50%
+    ```
+    Include 4-5 most relevant skills for {interest}, showing both strengths and areas for improvement.
+""",
+    "learning": """
+    ### 📚 Learning Path
+    Present a structured timeline SPECIFIC to {interest}:
+    1. **Month 1-2: Foundation**
+        - Course: "Course Name" (Platform) - Must be relevant to {interest}
+        - Project: "Project idea" - Must be relevant to {interest}
+        - Expected Outcome: "What they'll learn"
+""",
+    "projects": """
+    ### 💡 Project Portfolio
+    Present 3 project ideas AS CARDS that are SPECIFICALLY for {interest}:
+    ```project-card
+    Project: Name
+    Difficulty: ⭐⭐⭐☆☆
+    Duration: 2 weeks
+    Skills: skill1, skill2
+    Description: Brief description
+    ```
+""",
+    "certifications": """
+    ### 🎓 Certifications
+    List 2-3 recommended certifications SPECIFIC to {interest}:
+    - Certificate Name (Provider)
+    - Difficulty Level: ⭐⭐⭐☆☆
+    - Time Commitment: X-Y months
+    - Cost Range: $XXX (details)
+""",
+}
+
+PROMPT_REMINDERS = """
+    Remember to:
+    - Keep ALL advice focused on {interest}
+    - Use their resume/background to make recommendations more relevant
+    - Be specific and actionable in all recommendations
+    - Use proper formatting for visual elements (skill bars, project cards, diagram)
+"""
+
+
+MARKDOWN_OUTPUT = "Format your entire response in Markdown, making it highly visual and structured."
+JSON_OUTPUT = "Respond with a single JSON object that follows the response schema exactly."
+
+# Field-by-field guidance for the structured output mode; the shape comes from ADVICE_SCHEMA
+JSON_INSTRUCTIONS = """
+    Fill in every field of the JSON object:
+    - summary: a brief 2-3 sentence overview focusing specifically on their potential in {interest}, highlighting relevant existing skills and clear next steps.
+    - roles: 3 recommended roles IN THE {interest} FIELD ONLY, with a match score out of 10, a salary range, key requirements and why it fits their background.
+    - skills: the 4-5 most relevant skills for {interest} with their current level as a percentage, showing both strengths and areas for improvement.
+    - learning_path: a structured timeline SPECIFIC to {interest} in steps of about two months, each with a course ("Course Name (Platform)"), a project and the expected outcome.
+    - projects: 3 project ideas SPECIFICALLY for {interest}, with a difficulty from 1 to 5.
+    - certifications: 2-3 recommended certifications SPECIFIC to {interest}, with a difficulty from 1 to 5.
+
+    Remember to:
+    - Keep ALL advice focused on {interest}
+    - Use their resume/background to make recommendations more relevant
+    - Be specific and actionable in all recommendations
+"""
+
+JSON_GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": ADVICE_SCHEMA}
+
+
+def _profile_fields(
+    bio: str, interest: str, resume_text: Optional[str], output_format: str = MARKDOWN_OUTPUT
+) -> dict:
+    return {
+        "bio": bio,
+        "interest": interest,
+        "resume": resume_text if resume_text else "No resume provided.",
+        "output_format": output_format,
+    }
+
+
+def build_prompt(bio: str, interest: str, resume_text: Optional[str] = None) -> str:
+    """Builds the career advice prompt for the user's profile."""
+    fields = _profile_fields(bio, interest, resume_text)
+    sections = "".join(instructions.format(**fields) for instructions in SECTION_INSTRUCTIONS.values())
+    return (
+        PROMPT_PREAMBLE.format(**fields)
+        + "\n    Provide a structured response with the following sections:\n"
+        + sections
+        + PROMPT_REMINDERS.format(**fields)
+    )
+
+
+def build_section_prompt(bio: str, interest: str, resume_text: Optional[str], section: str) -> str:
+    """Prompt for a single section of the advice, sharing the profile preamble."""
+    fields = _profile_fields(bio, interest, resume_text)
+    return (
+        PROMPT_PREAMBLE.format(**fields)
+        + "\n    Write ONLY the following section, starting with its heading line exactly as shown:\n"
+        + SECTION_INSTRUCTIONS[section].format(**fields)
+        + PROMPT_REMINDERS.format(**fields)
+    )
+
+
+def build_json_prompt(bio: str, interest: str, resume_text: Optional[str] = None) -> str:
+    """Prompt for the structured output mode, answered with JSON_GENERATION_CONFIG."""
+    fields = _profile_fields(bio, interest, resume_text, JSON_OUTPUT)
+    return PROMPT_PREAMBLE.format(**fields) + JSON_INSTRUCTIONS.format(**fields)
+
+
+MODEL_NAME = "gemini-2.0-flash"
+
+# Gemini quotas this container schedules its calls against. Quotas are per
+# project, so with several containers give each its share of the project quota
+GEMINI_RPM = int(os.environ.get("ADVISOR_GEMINI_RPM", 2000))
+GEMINI_TPM = int(os.environ.get("ADVISOR_GEMINI_TPM", 4_000_000))
+# Output tokens expected from a whole advice response and from one fan-out section
+ADVICE_OUTPUT_TOKENS = int(os.environ.get("ADVISOR_ADVICE_OUTPUT_TOKENS", 2000))
+SECTION_OUTPUT_TOKENS = ADVICE_OUTPUT_TOKENS // len(SECTION_INSTRUCTIONS)
+# Times a call rate limited by Gemini is retried, after the scheduler's backoff
+QUOTA_RETRIES = int(os.environ.get("ADVISOR_QUOTA_RETRIES", 2))
+
+
+def list_model_names() -> list:
+    """Names of the Gemini models available to our API key."""
+    return [model.name for model in genai().list_models()]
+
+
+def make_quota_scheduler() -> QuotaScheduler:
+    latency_target = float(os.environ.get("ADVISOR_GEMINI_LATENCY_TARGET", 0))
+    rate_limited, _ = gemini_errors()
+    return QuotaScheduler(
+        GEMINI_RPM,
+        GEMINI_TPM,
+        # One Gemini call per request the container may be serving
+        max_concurrency=int(os.environ.get("ADVISOR_GEMINI_MAX_CONCURRENCY", ENDPOINT_MAX_INPUTS)),
+        max_wait={
+            INTERACTIVE: float(os.environ.get("ADVISOR_QUOTA_MAX_WAIT", 30)),
+            BATCH: float(os.environ.get("ADVISOR_BATCH_QUOTA_MAX_WAIT", 300)),
+        },
+        batch_reserve=float(os.environ.get("ADVISOR_BATCH_QUOTA_RESERVE", 0.2)),
+        latency_target=latency_target or None,
+        throttle_errors=(rate_limited,),
+    )
+
+
+def time_left(deadline: Optional[float]) -> Optional[float]:
+    """
+    Seconds until deadline (a time.time() timestamp), or None without one.
+    Raises TimeoutError once it has passed, so no model call is started or
+    read for a client that has given up.
+    """
+    if deadline is None:
+        return None
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise TimeoutError("The request deadline passed")
+    return remaining
+
+
+def count_if_expired(deadline: Optional[float]):
+    """
+    Counts a request whose generation ended short because its deadline
+    passed. Called once per request, where get_career_advice and
+    stream_career_advice give up, however many calls hit the deadline.
+    """
+    if deadline is not None and time.time() >= deadline:
+        abandoned_work.inc("generation", "deadline")
+
+
+def request_options(deadline: Optional[float]) -> Optional[dict]:
+    """generate_content request options that abort the call at deadline."""
+    return None if deadline is None else {"timeout": time_left(deadline)}
+
+
+class GeminiAdvisor:
+    """
+    Gemini client configured once per container and reused by every request,
+    so the hot path is a single generate_content call. Calls are admitted by
+    the container's QuotaScheduler, which estimates their tokens from the
+    prompt and the expected output.
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME, model=None, scheduler: Optional[QuotaScheduler] = None):
+        self.scheduler = scheduler or make_quota_scheduler()
+        if model is not None:
+            # Any object with generate_content, e.g. the fake in benchmarks/bench_pipeline.py
+            self.model = model
+            return
+        genai().configure(api_key=os.environ["GOOGLE_API_KEY"])
+
+        # Listing models costs a network round-trip, so only do it when debugging
+        if os.environ.get("ADVISOR_DEBUG_MODELS"):
+            try:
+                print("Available models:", list_model_names())
+            except Exception as e:
+                print(f"Could not list models: {e}")
+
+        self.model = genai().GenerativeModel(model_name=model_name)
+
+    def generate(
+        self,
+        prompt: str,
+        generation_config: Optional[dict] = None,
+        priority: int = INTERACTIVE,
+        output_tokens: int = ADVICE_OUTPUT_TOKENS,
+        deadline: Optional[float] = None,
+    ) -> str:
+        ResourceExhausted, _ = gemini_errors()
+        estimate = estimate_tokens(prompt) + output_tokens
+        for attempt in range(QUOTA_RETRIES + 1):
+            try:
+                with self.scheduler.admit(estimate, priority, timeout=time_left(deadline)):
+                    response = self.model.generate_content(
+                        prompt, generation_config=generation_config, request_options=request_options(deadline)
+                    )
+                break
+            except ResourceExhausted:
+                if attempt == QUOTA_RETRIES:
+                    raise
+        usage = getattr(response, "usage_metadata", None)
+        if usage and usage.total_token_count:
+            self.scheduler.refund(estimate - usage.total_token_count)
+        if response and hasattr(response, 'text'):
+            return response.text
+        return "Error: Received empty or invalid response from Gemini API"
+
+    def stream(
+        self,
+        prompt: str,
+        priority: int = INTERACTIVE,
+        deadline: Optional[float] = None,
+        output_tokens: int = ADVICE_OUTPUT_TOKENS,
+        cancelled: Optional[threading.Event] = None,
+    ):
+        """
+        Yields the text of a streamed generation. It stops reading, which
+        abandons the call, once deadline passes or cancelled is set (raising
+        GenerationCancelled) or when the generator is closed.
+        """
+        ResourceExhausted, _ = gemini_errors()
+        estimate = estimate_tokens(prompt) + output_tokens
+        for attempt in range(QUOTA_RETRIES + 1):
+            streaming = False
+            try:
+                with self.scheduler.admit(estimate, priority, timeout=time_left(deadline)):
+                    for chunk in self.model.generate_content(
+                        prompt, stream=True, request_options=request_options(deadline)
+                    ):
+                        # Stop reading once the deadline passes or nobody wants the result
+                        time_left(deadline)
+                        if cancelled is not None and cancelled.is_set():
+                            raise GenerationCancelled("Generation was cancelled")
+                        if chunk.text:
+                            streaming = True
+                            yield chunk.text
+                return
+            except ResourceExhausted:
+                # Once text has been sent a retry would repeat it
+                if streaming or attempt == QUOTA_RETRIES:
+                    raise
+
+
+class GenerationCancelled(Exception):
+    """Raised by GeminiAdvisor.stream when its cancelled event is set."""
+
+
+_advisor = None
+_advisor_lock = threading.Lock()
+
+
+def get_advisor() -> GeminiAdvisor:
+    """Returns this container's GeminiAdvisor, creating it on first use."""
+    global _advisor
+    with _advisor_lock:
+        if _advisor is None:
+            _advisor = GeminiAdvisor()
+        return _advisor
+
+
+# "single" asks for the whole response in one generation; "fanout" generates
+# each section with its own concurrent request
+GENERATION_MODE = os.environ.get("ADVISOR_GENERATION_MODE", "single")
+# "markdown" or "json" (structured advice following ADVICE_SCHEMA)
+OUTPUT_FORMAT = os.environ.get("ADVISOR_OUTPUT_FORMAT", "markdown")
+
+# Heading line each section starts with, e.g. "### 💫 Quick Summary"
+SECTION_HEADING_LINES = {
+    section: instructions.strip().splitlines()[0] for section, instructions in SECTION_INSTRUCTIONS.items()
+}
+
+
+def generate_section(
+    advisor: GeminiAdvisor,
+    bio: str,
+    interest: str,
+    resume_text: Optional[str],
+    section: str,
+    priority: int = INTERACTIVE,
+    deadline: Optional[float] = None,
+    cancelled: Optional[threading.Event] = None,
+) -> str:
+    """
+    Generates one section, making sure it starts with its heading so the UI
+    can place it. The section is streamed so that setting cancelled stops it
+    between chunks.
+    """
+    with timed("generation", "prompt"):
+        prompt = build_section_prompt(bio, interest, resume_text, section)
+    text = "".join(advisor.stream(
+        prompt, priority=priority, deadline=deadline, output_tokens=SECTION_OUTPUT_TOKENS, cancelled=cancelled
+    )).strip()
+    if not text.startswith(HEADING_PREFIXES):
+        text = f"{SECTION_HEADING_LINES[section]}\n{text}"
+    return text + "\n\n"
+
+
+def fanout_sections(
+    bio: str,
+    interest: str,
+    resume_text: Optional[str],
+    priority: int = INTERACTIVE,
+    deadline: Optional[float] = None,
+    cancelled: Optional[threading.Event] = None,
+):
+    """
+    Generates all sections concurrently, yielding (section, markdown) as each
+    one finishes. Closing the generator early, or setting cancelled, stops
+    the sections still being generated, without waiting for them.
+    """
+    advisor = get_advisor()
+    cancelled = cancelled or threading.Event()
+    pool = ThreadPoolExecutor(max_workers=len(SECTION_INSTRUCTIONS))
     try:
-        if filename.lower().endswith(".pdf"):
-            pdf_document = fitz.open(stream=file_content, filetype="pdf")
-            for page in pdf_document:
-                text += page.get_text()
-            pdf_document.close()
-        elif filename.lower().endswith(".docx"):
-            doc = docx.Document(io.BytesIO(file_content))
-            for para in doc.paragraphs:
-                text += para.text + "\n"
-    except Exception as e:
-        print(f"Error parsing file {filename}: {e}")
-        return f"Error parsing resume: {e}"
-    return text
+        futures = {
+            pool.submit(
+                generate_section, advisor, bio, interest, resume_text, section, priority, deadline, cancelled
+            ): section
+            for section in SECTION_INSTRUCTIONS
+        }
+        errors = []
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                if not cancelled.is_set():
+                    print(f"Generate content error in {futures[future]} section: {str(e)}")
+                errors.append(e)
+        if len(errors) == len(futures):
+            raise errors[0]
+    finally:
+        cancelled.set()
+        pool.shutdown(wait=False, cancel_futures=True)
 
 
-@app.function(timeout=120)
+@app.function(timeout=120, enable_memory_snapshot=MEMORY_SNAPSHOT)
 def get_career_advice(
     bio: str,
     interest: str,
     resume_text: Optional[str] = None,
+    mode: str = GENERATION_MODE,
+    output_format: str = "markdown",
+    priority: int = INTERACTIVE,
+    deadline: Optional[float] = None,
 ):
-    """The main agent function that queries the Gemini API."""
+    """
+    The main agent function that queries the Gemini API. With output_format
+    "json" it returns a JSON object following ADVICE_SCHEMA instead of Markdown.
+    Batch work passes priority=BATCH so interactive requests are admitted
+    first. Raises QuotaExceeded when the call could not be admitted in time.
+    Generation is given up once deadline (a time.time() timestamp) passes.
+    """
+    start_metrics_publisher()
     try:
-        # Configure the Gemini API client
-        genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
-        
-        # List available models to debug
-        try:
-            models = genai.list_models()
-            print("Available models:", [model.name for model in models])
-        except Exception as e:
-            print(f"Could not list models: {e}")
-
-        # Initialize the Generative Model with explicit model name
-        model = genai.GenerativeModel(model_name='gemini-2.0-flash')
-        
-        prompt = f"""
-        You are an expert career advisor and coach. Your goal is to provide clear, actionable, and visually structured career advice.
-        Format your entire response in Markdown, making it highly visual and structured.
-
-        Here is the user's profile:
-        Primary Interest Area: {interest}
-        Bio: {bio}
-        Resume Content: {resume_text if resume_text else "No resume provided."}
-
-        Important Instructions:
-        1. Focus PRIMARILY on the user's chosen interest area ({interest}). All advice should be specifically tailored to this field.
-        2. If a resume is provided, analyze their current skills and experience to provide more personalized recommendations.
-        3. Ensure all recommendations, courses, and projects are SPECIFICALLY relevant to {interest}.
-        4. Use the resume content to identify transferable skills that would be valuable in {interest}.
-
-        Provide a structured response with the following sections:
-
-        ### 💫 Quick Summary
-        A brief 2-3 sentence overview focusing specifically on their potential in {interest}, highlighting relevant existing skills and clear next steps.
-
-        ### 🎯 Recommended Roles
-        Present 3 recommended roles IN THE {interest} FIELD ONLY in this format:
-        1. **Role Name** (Match Score: X/10)
-            - Salary Range: $XX,XXX - $XXX,XXX
-            - Key Requirements: req1, req2, req3
-            - Why It Fits: Brief explanation based on their background
-
-        ### 📊 Skills Assessment
-        Analyze their current skills relevant to {interest}. Use this format:
-        ```skill-meter
-        Current Skills Relevant to {interest}:
-        Skill Name     [█████░░░░░] 50%
-        ```
-        Include 4-5 most relevant skills for {interest}, showing both strengths and areas for improvement.
-
-        ### 📚 Learning Path
-        Present a structured timeline SPECIFIC to {interest}:
-        1. **Month 1-2: Foundation**
-            - Course: "Course Name" (Platform) - Must be relevant to {interest}
-            - Project: "Project idea" - Must be relevant to {interest}
-            - Expected Outcome: "What they'll learn"
-
-        ### 💡 Project Portfolio
-        Present 3 project ideas AS CARDS that are SPECIFICALLY for {interest}:
-        ```project-card
-        Project: Name
-        Difficulty: ⭐⭐⭐☆☆
-        Duration: 2 weeks
-        Skills: skill1, skill2
-        Description: Brief description
-        ```
-
-        ### 🎓 Certifications
-        List 2-3 recommended certifications SPECIFIC to {interest}:
-        - Certificate Name (Provider)
-        - Difficulty Level: ⭐⭐⭐☆☆
-        - Time Commitment: X-Y months
-        - Cost Range: $XXX (details)
-
-        Remember to:
-        - Keep ALL advice focused on {interest}
-        - Use their resume/background to make recommendations more relevant
-        - Be specific and actionable in all recommendations
-        - Use proper formatting for visual elements (skill bars, project cards, diagram)
-        """
+        advisor = get_advisor()
 
         try:
-            response = model.generate_content(prompt)
-            if response and hasattr(response, 'text'):
-                return response.text
-            else:
-                return "Error: Received empty or invalid response from Gemini API"
+            if output_format == "json":
+                with timed("generation", "prompt"):
+                    prompt = build_json_prompt(bio, interest, resume_text)
+                return advisor.generate(
+                    prompt, generation_config=JSON_GENERATION_CONFIG, priority=priority, deadline=deadline
+                )
+            if mode == "fanout":
+                sections = dict(fanout_sections(bio, interest, resume_text, priority, deadline))
+                if len(sections) < len(SECTION_INSTRUCTIONS):
+                    count_if_expired(deadline)
+                # Same Markdown shape as the single prompt, sections in their usual order
+                return "".join(sections[section] for section in SECTION_INSTRUCTIONS if section in sections)
+            with timed("generation", "prompt"):
+                prompt = build_prompt(bio, interest, resume_text)
+            return advisor.generate(prompt, priority=priority, deadline=deadline)
+        except QuotaExceeded:
+            raise
         except Exception as e:
             print(f"Generate content error: {str(e)}")
+            count_if_expired(deadline)
             return f"Error generating content: {str(e)}"
-            
+
+    except QuotaExceeded:
+        raise
     except KeyError:
         return "Error: GOOGLE_API_KEY not found in environment variables"
     except Exception as e:
@@ -141,30 +559,784 @@ def get_career_advice(
         return f"An unexpected error occurred: {str(e)}"
 
 
+class StreamError(str):
+    """
+    Error text stream_career_advice yields in place of the rest of the advice:
+    shown to the user like any chunk, but marks the stream as failed.
+    """
+
+
+@app.function(timeout=120, enable_memory_snapshot=MEMORY_SNAPSHOT)
+def stream_career_advice(
+    bio: str,
+    interest: str,
+    resume_text: Optional[str] = None,
+    mode: str = GENERATION_MODE,
+    deadline: Optional[float] = None,
+    cancelled: Optional[threading.Event] = None,
+):
+    """
+    Streaming variant of get_career_advice that yields Markdown chunks as Gemini
+    writes them. In fanout mode each chunk is a whole section, in the order the
+    sections finish.
+    """
+    start_metrics_publisher()
+    try:
+        advisor = get_advisor()
+
+        try:
+            if mode == "fanout":
+                finished = 0
+                for _, markdown in fanout_sections(bio, interest, resume_text, deadline=deadline, cancelled=cancelled):
+                    finished += 1
+                    yield markdown
+                if finished < len(SECTION_INSTRUCTIONS):
+                    count_if_expired(deadline)
+                    missing = len(SECTION_INSTRUCTIONS) - finished
+                    yield StreamError(f"Error generating content: {missing} sections could not be generated")
+            else:
+                with timed("generation", "prompt"):
+                    prompt = build_prompt(bio, interest, resume_text)
+                yield from advisor.stream(prompt, deadline=deadline, cancelled=cancelled)
+        except QuotaExceeded:
+            raise
+        except Exception as e:
+            print(f"Generate content error: {str(e)}")
+            count_if_expired(deadline)
+            yield StreamError(f"Error generating content: {str(e)}")
+
+    except QuotaExceeded:
+        raise
+    except KeyError:
+        yield StreamError("Error: GOOGLE_API_KEY not found in environment variables")
+    except Exception as e:
+        print(f"Unexpected error: {str(e)}")
+        yield StreamError(f"An unexpected error occurred: {str(e)}")
+
+
+def make_advice_cache():
+    """
+    Builds the advice cache picked by ADVICE_CACHE_BACKEND: "dict" (shared by all
+    containers through a modal.Dict, the default), "memory" (per container LRU)
+    or "none".
+    """
+    backend = os.environ.get("ADVICE_CACHE_BACKEND", "dict")
+    ttl = float(os.environ.get("ADVICE_CACHE_TTL", 24 * 60 * 60))
+    if backend == "dict":
+        store = modal.Dict.from_name("career-advisor-advice-cache", create_if_missing=True)
+        return SharedDictCache(store, ttl=ttl)
+    if backend == "memory":
+        return LRUCache(max_entries=int(os.environ.get("ADVICE_CACHE_SIZE", 512)), ttl=ttl)
+    return None
+
+
+advice_cache = make_advice_cache()
+
+
+# Parsed resume text keyed by the SHA-256 of the uploaded file
+RESUME_CACHE_DIR = "/resume-cache"
+resume_volume = modal.Volume.from_name("career-advisor-resume-cache", create_if_missing=True)
+
+
+def make_resume_cache():
+    """
+    Builds the parsed-resume cache picked by RESUME_CACHE_BACKEND: "memory"
+    (per container LRU bounded in bytes, the default), "volume" (the LRU in
+    front of files on the resume_volume, shared and persistent) or "none".
+    """
+    backend = os.environ.get("RESUME_CACHE_BACKEND", "memory")
+    if backend == "none":
+        return None
+    memory = LRUCache(
+        max_entries=int(os.environ.get("RESUME_CACHE_SIZE", 1024)),
+        max_bytes=int(os.environ.get("RESUME_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    )
+    if backend == "volume" and os.path.isdir(RESUME_CACHE_DIR):
+        volume = DirectoryCache(
+            RESUME_CACHE_DIR,
+            commit=resume_volume.commit,
+            reload=resume_volume.reload,
+            reload_interval=float(os.environ.get("RESUME_CACHE_RELOAD_INTERVAL", 10)),
+        )
+        return TieredCache(memory, volume)
+    return memory
+
+
+resume_cache = make_resume_cache()
+
+# Each container publishes its stage histograms here and the metrics endpoint merges them
+metrics_store = modal.Dict.from_name("career-advisor-metrics", create_if_missing=True)
+METRICS_PUBLISH_INTERVAL = float(os.environ.get("ADVISOR_METRICS_PUBLISH_INTERVAL", 15))
+# Containers that have not published for this long are dropped from the metrics
+METRICS_RETENTION = float(os.environ.get("ADVISOR_METRICS_RETENTION", 24 * 3600))
+_metrics_publisher = None
+_metrics_publisher_lock = threading.Lock()
+
+
+def _publish_metrics_forever():
+    key = os.environ.get("MODAL_TASK_ID") or uuid.uuid4().hex
+    while True:
+        time.sleep(METRICS_PUBLISH_INTERVAL)
+        try:
+            metrics_store.put(key, {
+                "updated": time.time(),
+                "series": stage_seconds.snapshot(),
+                "abandoned": abandoned_work.snapshot(),
+            })
+        except Exception as e:
+            print(f"Publishing metrics failed: {e}")
+
+
+def start_metrics_publisher():
+    """Starts this container's metrics publishing thread, once."""
+    global _metrics_publisher
+    with _metrics_publisher_lock:
+        if _metrics_publisher is None:
+            _metrics_publisher = threading.Thread(target=_publish_metrics_forever, daemon=True)
+            _metrics_publisher.start()
+            # The container's first input; a restored snapshot's clock says nothing about its start
+            if not MEMORY_SNAPSHOT:
+                seconds = time.perf_counter() - MODULE_STARTED
+                stage_seconds.observe(seconds, "cold_start", "first input")
+                print(f"Cold start: first input {seconds * 1000:.0f} ms after the module started loading")
+
+
+def cache_lookup(cache, key: str, label: str) -> Optional[str]:
+    """Looks up a cache entry; cache failures count as a miss."""
+    if cache is None:
+        return None
+    try:
+        value = cache.get(key)
+    except Exception as e:
+        print(f"{label} cache lookup failed: {e}")
+        return None
+    if should_log():
+        print(f"{label} cache {'hit' if value else 'miss'}:", cache.stats())
+    return value
+
+
+def cache_store(cache, key: str, value: str, label: str):
+    if cache is None:
+        return
+    try:
+        cache.set(key, value)
+    except Exception as e:
+        print(f"{label} cache store failed: {e}")
+
+
+def get_cached_advice(cache_key: str) -> Optional[str]:
+    return cache_lookup(advice_cache, cache_key, "Advice")
+
+
+def store_advice(cache_key: str, advice: str):
+    """Caches generated advice. Error messages and responses missing a section are skipped."""
+    if advice and all(prefix in advice for prefix, key in SECTION_HEADINGS if key):
+        cache_store(advice_cache, cache_key, advice, "Advice")
+
+
+# Concurrent requests for the same advice (a shared example, a double click)
+# wait on the generation already running instead of starting their own; a
+# streamed generation nobody follows any more is stopped
+advice_flights = SingleFlight(on_abandon=lambda key: abandoned_work.inc("generation", "aborted"))
+
+
+def cache_advice_stream(chunks, cache_key: str):
+    """
+    Passes the streamed chunks through and caches the full advice once it is
+    complete. Nothing is cached if the stream reported an error.
+    """
+    parts = []
+    failed = False
+    for chunk in chunks:
+        failed = failed or isinstance(chunk, StreamError)
+        parts.append(chunk)
+        yield chunk
+    if not failed:
+        store_advice(cache_key, "".join(parts))
+
+
+def run_career_advice(
+    bio: str,
+    interest: str,
+    resume_text: Optional[str],
+    stream: bool = False,
+    mode: Optional[str] = None,
+    output_format: str = "markdown",
+    priority: int = INTERACTIVE,
+    deadline: Optional[float] = None,
+    cancelled: Optional[threading.Event] = None,
+):
+    """
+    Runs advice generation in this container, or in a separate
+    get_career_advice / stream_career_advice container when
+    ADVISOR_EXECUTION_MODE is "remote". JSON output is never streamed,
+    and streams are always interactive. Setting cancelled stops a local
+    stream; a remote one stops when it is closed.
+    """
+    mode = mode or GENERATION_MODE
+    if os.environ.get("ADVISOR_EXECUTION_MODE", "local") == "remote":
+        if stream:
+            return stream_career_advice.remote_gen(bio, interest, resume_text, mode, deadline)
+        return get_career_advice.remote(bio, interest, resume_text, mode, output_format, priority, deadline)
+    if stream:
+        return stream_career_advice.local(bio, interest, resume_text, mode, deadline, cancelled)
+    return get_career_advice.local(bio, interest, resume_text, mode, output_format, priority, deadline)
+
+
+# Seconds the client has left for its request, sent by app.py; the deadline
+# is capped at (and defaults to) the generation functions' timeout
+DEADLINE_HEADER = "X-Advisor-Timeout"
+# Set to "sections" on streams whose chunks each carry whole sections (fanout mode)
+CHUNKS_HEADER = "X-Advisor-Chunks"
+MAX_REQUEST_SECONDS = 120
+# How often a streaming request still waiting for its first chunk checks for a disconnect
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+def request_deadline(request: Request) -> float:
+    """The time.time() by which the client needs its advice."""
+    try:
+        seconds = float(request.headers.get(DEADLINE_HEADER, MAX_REQUEST_SECONDS))
+    except ValueError:
+        seconds = MAX_REQUEST_SECONDS
+    return time.time() + min(seconds, MAX_REQUEST_SECONDS)
+
+
+# Largest resume accepted, checked against Content-Length before the body is read
+MAX_UPLOAD_BYTES = int(os.environ.get("ADVISOR_MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+# Room for the form fields and multipart boundaries around the file
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+# Threads for the endpoint's blocking work (cache lookups, following generation)
+ENDPOINT_THREADS = int(os.environ.get("ADVISOR_ENDPOINT_THREADS", ENDPOINT_MAX_INPUTS))
+# Processes extracting uploaded resumes, so parsing neither holds the GIL
+# nor blocks the event loop (0: parse in the endpoint's threads)
+RESUME_PARSE_WORKERS = int(os.environ.get("ADVISOR_RESUME_PARSE_WORKERS", 2))
+
+_endpoint_pool = None
+_parse_pool = None
+_parse_pool_started = False
+_pool_lock = threading.Lock()
+
+
+def run_blocking(fn, *args, **kwargs):
+    """Awaitable running fn(*args, **kwargs) in the endpoint's thread pool."""
+    global _endpoint_pool
+    with _pool_lock:
+        if _endpoint_pool is None:
+            _endpoint_pool = ThreadPoolExecutor(max_workers=ENDPOINT_THREADS, thread_name_prefix="endpoint")
+    return asyncio.get_running_loop().run_in_executor(_endpoint_pool, functools.partial(fn, *args, **kwargs))
+
+
+def get_parse_pool():
+    """The resume parsing processes, or None when parsing runs in threads."""
+    global _parse_pool
+    with _pool_lock:
+        if _parse_pool is None and RESUME_PARSE_WORKERS:
+            _parse_pool = process_pool(RESUME_PARSE_WORKERS)
+    return _parse_pool
+
+
+def _warm_parse_pool():
+    pool = get_parse_pool()
+    if pool is not None:
+        pool.submit(int).result()
+
+
+def start_parse_pool():
+    """
+    Starts the fork server and a parsing process in the background, once,
+    so the first upload does not wait for them. Called by web_endpoint,
+    the only function that parses in the pool.
+    """
+    global _parse_pool_started
+    with _pool_lock:
+        if _parse_pool_started:
+            return
+        _parse_pool_started = True
+    threading.Thread(target=_warm_parse_pool, daemon=True).start()
+
+
+def parse_in_pool(file_content: bytes, filename: str) -> str:
+    """parse_resume in the parsing processes, waiting for the result."""
+    pool = get_parse_pool()
+    if pool is None:
+        return parse_resume(file_content, filename)
+    return pool.submit(parse_resume, file_content, filename).result()
+
+
+def parse_resume_cached(file_content: bytes, filename: str, timer: StageTimer, parse=parse_resume) -> str:
+    """Extracts resume text with parse, reusing the text of a file we have already seen."""
+    resume_hash = content_hash(file_content)
+    resume_text = cache_lookup(resume_cache, resume_hash, "Resume")
+    if resume_text is None:
+        with timer.stage("parse"):
+            resume_text = parse(file_content, filename)
+        if not is_parse_error(resume_text):
+            cache_store(resume_cache, resume_hash, resume_text, "Resume")
+    return resume_text
+
+
+def condense_for_prompt(resume_text: Optional[str], timer: StageTimer) -> Optional[str]:
+    """Condenses resume text to the token budget and logs the saving."""
+    if not resume_text or is_parse_error(resume_text):
+        return resume_text
+    with timer.stage("condense"):
+        condensed = condense_resume(resume_text)
+    if should_log():
+        print(f"Resume tokens (estimated): {estimate_tokens(resume_text)} -> {estimate_tokens(condensed)}")
+    return condensed
+
+
+def max_request_bytes(content_type: str) -> int:
+    """Body size limit; base64 in the legacy JSON body inflates the file by 4/3."""
+    if content_type.startswith("multipart/form-data"):
+        return MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES
+    return MAX_UPLOAD_BYTES * 4 // 3 + FORM_OVERHEAD_BYTES
+
+
+async def read_advice_request(request: Request):
+    """
+    Reads the request body, either multipart/form-data with the resume as a
+    file part or the older JSON body with the resume base64 encoded.
+    Returns (fields, resume bytes or None, resume filename or None).
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        fields = {
+            "bio": form.get("bio"),
+            "interest": form.get("interest"),
+            "stream": str(form.get("stream", "")).lower() in ("1", "true", "yes"),
+            "mode": form.get("mode"),
+            "format": form.get("format"),
+        }
+        upload = form.get("resume")
+        if upload is None or isinstance(upload, str):
+            return fields, None, None
+        file_content = await upload.read()
+        await upload.close()
+        return fields, file_content, upload.filename
+
+    data = await request.json()
+    resume_data = data.get("resume")
+    if not resume_data:
+        return data, None, None
+    import base64
+    return data, base64.b64decode(resume_data["data"]), resume_data["name"]
+
+
 # --- FIX 1: Use the new decorator name ---
-@app.function()
+@app.function(
+    volumes={RESUME_CACHE_DIR: resume_volume},
+    min_containers=ENDPOINT_MIN_CONTAINERS,
+    enable_memory_snapshot=MEMORY_SNAPSHOT,
+)
+@modal.concurrent(max_inputs=ENDPOINT_MAX_INPUTS, target_inputs=ENDPOINT_TARGET_INPUTS)
 @modal.fastapi_endpoint(method="POST")
-def web_endpoint(data: dict):
+async def web_endpoint(request: Request):
     """
     This is the web endpoint that our Gradio app will call.
+    The resume is sent as a multipart/form-data file part (fields: bio,
+    interest, stream, resume); a JSON body with a base64 resume still works.
+    Clients that extract the resume themselves send it as "resume_text" in
+    the JSON body instead. A JSON body may also carry just "resume_sha256";
+    if that file is not in the resume cache the endpoint answers 409 with
+    "resume_required" and the client uploads the file.
+    Set "stream" to receive the advice as a chunked text/plain stream
+    instead of a single JSON object, and "mode" to "single" or "fanout" to
+    override ADVISOR_GENERATION_MODE. With "format" (or ADVISOR_OUTPUT_FORMAT)
+    set to "json" the advice comes back parsed, as {"structured": {...}}.
+    Requests that get no Gemini quota in time are answered with a 429 and
+    a Retry-After header. Generation stops when the seconds given in the
+    DEADLINE_HEADER run out, or when a streaming client disconnects.
+    Fanout streams carry the CHUNKS_HEADER, as each of their chunks is a
+    whole section.
     """
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    start_metrics_publisher()
+    start_parse_pool()
+    timer = StageTimer("web_endpoint")
+    deadline = request_deadline(request)
     try:
-        print("Received request with data:", data)
+        content_length = request.headers.get("content-length")
+        if content_length is None:
+            return JSONResponse({"advice": "Error: Content-Length header is required"}, status_code=411)
+        if int(content_length) > max_request_bytes(request.headers.get("content-type", "")):
+            return JSONResponse(
+                {"advice": f"Error: resume is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"},
+                status_code=413,
+            )
+
+        with timer.stage("decode"):
+            data, file_content, filename = await read_advice_request(request)
         bio = data.get("bio")
         interest = data.get("interest")
-        resume_data = data.get("resume") 
-
-        resume_text = None
-        if resume_data:
-            import base64
-            file_content = base64.b64decode(resume_data["data"])
-            resume_text = parse_resume(file_content, resume_data["name"])
-            print("Parsed resume text length:", len(resume_text) if resume_text else 0)
-
-        # Call the main agent function
-        advice = get_career_advice.remote(bio, interest, resume_text)
-        print("Generated advice length:", len(advice) if advice else 0)
-        return {"advice": advice}
+
+        # Resumes parsed next to the upload arrive as text; parse here otherwise,
+        # reusing the text of a file we have already seen
+        resume_text = data.get("resume_text")
+        resume_hash = data.get("resume_sha256")
+        if file_content is not None:
+            resume_text = await run_blocking(parse_resume_cached, file_content, filename, timer, parse_in_pool)
+        elif resume_hash and resume_text is None:
+            resume_text = await run_blocking(cache_lookup, resume_cache, resume_hash, "Resume")
+            if resume_text is None:
+                # Ask the client to send the file itself
+                return JSONResponse(
+                    {"advice": "Error: resume not cached, upload the file", "resume_required": True},
+                    status_code=409,
+                )
+
+        resume_text = await run_blocking(condense_for_prompt, resume_text, timer)
+
+        if (data.get("format") or OUTPUT_FORMAT) == "json":
+            response = await structured_advice_response(bio, interest, resume_text, deadline, timer)
+            timer.log()
+            return response
+
+        cache_key = advice_cache_key(bio, interest, resume_text, PROMPT_VERSION)
+        with timer.stage("cache"):
+            advice = await run_blocking(get_cached_advice, cache_key)
+
+        if data.get("stream"):
+            # Stream the Markdown back as it is generated so the UI can
+            # render each section as soon as it is finished.
+            if advice:
+                # A cache hit is not generation, so keep it out of the model timings
+                with timer.stage("return"):
+                    response = StreamingResponse(iter([advice]), media_type="text/plain; charset=utf-8")
+                timer.log()
+                return response
+            follower = advice_flights.stream(cache_key, lambda cancelled: cache_advice_stream(
+                run_career_advice(
+                    bio, interest, resume_text, stream=True, mode=data.get("mode"), deadline=deadline,
+                    cancelled=cancelled,
+                ),
+                cache_key,
+            ))
+            chunks = timer.timed_stream(follower, "model")
+            # Wait for the first chunk before sending headers, so a call that
+            # gets no Gemini quota can still be answered with a 429
+            first = await first_chunk(request, chunks, follower)
+            headers = {CHUNKS_HEADER: "sections"} if (data.get("mode") or GENERATION_MODE) == "fanout" else None
+            return StreamingResponse(
+                stream_body(first, chunks, follower), media_type="text/plain; charset=utf-8", headers=headers
+            )
+
+        if not advice:
+            # Call the main agent function
+            with timer.stage("model"):
+                advice, shared = await run_blocking(
+                    advice_flights.call, cache_key, run_career_advice, bio, interest, resume_text,
+                    mode=data.get("mode"), deadline=deadline,
+                )
+            if not shared:
+                await run_blocking(store_advice, cache_key, advice)
+        with timer.stage("return"):
+            response = JSONResponse({"advice": advice})
+        timer.log()
+        return response
+    except QuotaExceeded as e:
+        timer.log()
+        return JSONResponse(
+            {"advice": f"Error: {e}"}, status_code=429, headers={"Retry-After": str(round(e.retry_after))}
+        )
     except Exception as e:
         print(f"Error in web endpoint: {str(e)}")
-        return {"advice": f"Error occurred in web endpoint: {str(e)}"}
\ No newline at end of file
+        timer.log()
+        return {"advice": f"Error occurred in web endpoint: {str(e)}"}
+
+
+async def first_chunk(request: Request, chunks, follower) -> Optional[str]:
+    """
+    Waits for the first of chunks, checking meanwhile whether the client has
+    disconnected, in which case the generation is no longer followed.
+    """
+    waiting = asyncio.ensure_future(run_blocking(next, chunks, None))
+    while True:
+        done, _ = await asyncio.wait({waiting}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return waiting.result()
+        if await request.is_disconnected():
+            abandoned_work.inc("web_endpoint", "disconnect")
+            follower.close()
+            return await waiting
+
+
+async def stream_body(first: Optional[str], chunks, follower):
+    """
+    Sends first and then the rest of chunks. If the client disconnects before
+    the end, stops following the generation, which is aborted unless another
+    request still follows it.
+    """
+    try:
+        chunk = first
+        while chunk is not None:
+            yield chunk
+            chunk = await run_blocking(next, chunks, None)
+    except (asyncio.CancelledError, GeneratorExit):
+        abandoned_work.inc("web_endpoint", "disconnect")
+        follower.close()
+        raise
+
+
+async def structured_advice_response(
+    bio: str, interest: str, resume_text: Optional[str], deadline: float, timer: StageTimer
+):
+    """Generates (or reuses) JSON advice and answers with it parsed against ADVICE_SCHEMA."""
+    from fastapi.responses import JSONResponse
+
+    cache_key = advice_cache_key(bio, interest, resume_text, f"{PROMPT_VERSION}-json")
+    with timer.stage("cache"):
+        advice = await run_blocking(get_cached_advice, cache_key)
+    # Only the request that generated the advice caches it
+    fresh = not advice
+    if fresh:
+        with timer.stage("model"):
+            advice, shared = await run_blocking(
+                advice_flights.call, cache_key, run_career_advice, bio, interest, resume_text,
+                output_format="json", deadline=deadline,
+            )
+        fresh = not shared
+    try:
+        with timer.stage("parse"):
+            structured = parse_advice(advice)
+    except ValueError as e:
+        # Generation errors come back as plain text, which is not JSON either
+        print(f"Structured advice rejected: {e}")
+        return JSONResponse({"advice": advice if advice.startswith(("Error", "An unexpected")) else f"Error: {e}"})
+    if fresh:
+        await run_blocking(cache_store, advice_cache, cache_key, advice, "Advice")
+    return JSONResponse({"structured": structured.to_dict()})
+
+
+@app.function()
+@modal.fastapi_endpoint(method="GET")
+def diagnostics():
+    """Lists the Gemini models our API key can use, for checking the deployment."""
+    try:
+        genai().configure(api_key=os.environ["GOOGLE_API_KEY"])
+        return {"model": MODEL_NAME, "available_models": list_model_names()}
+    except Exception as e:
+        return {"model": MODEL_NAME, "error": str(e)}
+
+
+@app.function()
+@modal.fastapi_endpoint(method="GET")
+def metrics(format: str = "prometheus"):
+    """
+    Per-stage latency histograms and abandoned-work counts merged across
+    containers, in the Prometheus text format, or with ?format=json as count,
+    mean and p50/p95/p99 per stage plus the abandoned counts.
+    """
+    from fastapi.responses import PlainTextResponse
+
+    merged = Histogram(stage_seconds.name, stage_seconds.help_text)
+    abandoned = Counter(abandoned_work.name, abandoned_work.help_text)
+    now = time.time()
+    for key, entry in list(metrics_store.items()):
+        if now - entry["updated"] > METRICS_RETENTION:
+            metrics_store.pop(key)
+            continue
+        merged.merge(entry["series"])
+        abandoned.merge(entry.get("abandoned", []))
+    if format == "json":
+        return metrics_summary(merged, abandoned)
+    return PlainTextResponse(merged.exposition() + abandoned.exposition(), media_type="text/plain; version=0.0.4")
+
+
+# Containers working on batch profiles at once; keep below the Gemini rate limit
+BATCH_MAX_CONTAINERS = int(os.environ.get("ADVISOR_BATCH_MAX_CONTAINERS", 10))
+
+
+@app.function(
+    timeout=180,
+    max_containers=BATCH_MAX_CONTAINERS,
+    volumes={RESUME_CACHE_DIR: resume_volume},
+    enable_memory_snapshot=MEMORY_SNAPSHOT,
+)
+def advise_profile(profile: dict) -> dict:
+    """
+    Generates advice for one batch profile: {"id", "bio", "interest"} plus
+    either "resume_text" or "resume_bytes" and "resume_name".
+    Returns {"id", "advice", "seconds"} or {"id", "error", "seconds"}.
+    """
+    start_metrics_publisher()
+    timer = StageTimer(f"advise_profile {profile.get('id')}", component="advise_profile")
+    started = time.monotonic()
+    try:
+        resume_text = profile.get("resume_text")
+        if profile.get("resume_bytes"):
+            resume_text = parse_resume_cached(profile["resume_bytes"], profile["resume_name"], timer)
+        resume_text = condense_for_prompt(resume_text, timer)
+
+        bio, interest = profile["bio"], profile["interest"]
+        cache_key = advice_cache_key(bio, interest, resume_text, PROMPT_VERSION)
+        advice = get_cached_advice(cache_key)
+        if not advice:
+            with timer.stage("model"):
+                advice = run_career_advice(bio, interest, resume_text, priority=BATCH)
+            store_advice(cache_key, advice)
+        timer.log()
+        # get_career_advice reports failures as text; only real advice has section headings
+        if not any(prefix in advice for prefix in HEADING_PREFIXES):
+            return {"id": profile.get("id"), "error": advice, "seconds": time.monotonic() - started}
+        return {"id": profile.get("id"), "advice": advice, "seconds": time.monotonic() - started}
+    except Exception as e:
+        print(f"Error advising profile {profile.get('id')}: {e}")
+        return {"id": profile.get("id"), "error": str(e), "seconds": time.monotonic() - started}
+
+
+def load_resume(profile: dict) -> dict:
+    """Reads the resume file of a CSV profile just before it is sent."""
+    resume_path = profile.pop("resume_path", None)
+    if resume_path:
+        with open(resume_path, "rb") as f:
+            profile["resume_bytes"] = f.read()
+        profile["resume_name"] = os.path.basename(resume_path)
+    return profile
+
+
+async def advise_profiles(profiles: list, concurrency: int):
+    """Runs advise_profile over the profiles, at most concurrency at a time, yielding results as they finish."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def advise(profile):
+        async with semaphore:
+            profile = await asyncio.to_thread(load_resume, profile)
+            return await advise_profile.remote.aio(profile)
+
+    for result in asyncio.as_completed([advise(profile) for profile in profiles]):
+        yield await result
+
+
+# Most profiles one batch_endpoint call may ask for
+BATCH_MAX_PROFILES = int(os.environ.get("ADVISOR_BATCH_MAX_PROFILES", 1000))
+
+
+@app.function(timeout=3600)
+@modal.fastapi_endpoint(method="POST", requires_proxy_auth=True)
+async def batch_endpoint(data: dict):
+    """
+    Advice for many profiles in one call. The body is
+    {"profiles": [{"id", "bio", "interest", "resume_text"?}, ...], "concurrency": 8};
+    results stream back as JSON Lines in the order they finish.
+    Callers authenticate with a Modal proxy auth token (Modal-Key and
+    Modal-Secret headers), since every call spends Gemini quota; at most
+    BATCH_MAX_PROFILES profiles are accepted per call, and every profile
+    needs a bio and an interest.
+    """
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    raw_profiles = data.get("profiles") or []
+    try:
+        concurrency = int(data.get("concurrency", 8))
+    except (TypeError, ValueError):
+        return JSONResponse({"error": "concurrency must be an integer"}, status_code=400)
+    if not isinstance(raw_profiles, list) or not all(isinstance(profile, dict) for profile in raw_profiles):
+        return JSONResponse({"error": "profiles must be a list of objects"}, status_code=400)
+    if len(raw_profiles) > BATCH_MAX_PROFILES:
+        return JSONResponse(
+            {"error": f"at most {BATCH_MAX_PROFILES} profiles per call, split the batch"}, status_code=400
+        )
+    for index, profile in enumerate(raw_profiles):
+        for field in ("bio", "interest"):
+            value = profile.get(field)
+            if not isinstance(value, str) or not value.strip():
+                return JSONResponse(
+                    {"error": f"profile {profile.get('id', index)} needs a non-empty {field}"}, status_code=400
+                )
+
+    profiles = []
+    for index, profile in enumerate(raw_profiles):
+        # Resumes come as text over HTTP; never read paths or raw bytes from the request
+        profiles.append({
+            "id": str(profile.get("id", index)),
+            "bio": profile.get("bio"),
+            "interest": profile.get("interest"),
+            "resume_text": profile.get("resume_text"),
+        })
+    concurrency = max(1, min(concurrency, BATCH_MAX_CONTAINERS * 4))
+
+    async def results():
+        async for result in advise_profiles(profiles, concurrency):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+def read_batch_csv(csv_path: str) -> list:
+    """Profiles from a CSV with bio, interest and optional id and resume_path columns."""
+    base_dir = os.path.dirname(os.path.abspath(csv_path))
+    profiles = []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row_number, row in enumerate(csv.DictReader(f), start=1):
+            profile = {
+                "id": row.get("id") or str(row_number),
+                "bio": row["bio"],
+                "interest": row["interest"],
+            }
+            resume_path = (row.get("resume_path") or "").strip()
+            if resume_path:
+                profile["resume_path"] = os.path.join(base_dir, resume_path)
+            profiles.append(profile)
+    return profiles
+
+
+def completed_ids(output_path: str) -> set:
+    """Ids already advised successfully in an earlier run writing to output_path."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted run
+                continue
+            if "advice" in result:
+                done.add(str(result["id"]))
+    return done
+
+
+@app.local_entrypoint()
+def batch(csv_path: str, output: str = "advice.jsonl", concurrency: int = 8):
+    """
+    Advise a cohort from a CSV file, appending JSON Lines to output.
+    Re-running with the same output skips profiles that already succeeded.
+
+        modal run modal_agent_gemini.py::batch --csv-path cohort.csv --concurrency 8
+    """
+    done = completed_ids(output)
+    profiles = [profile for profile in read_batch_csv(csv_path) if profile["id"] not in done]
+    print(f"{len(done)} profiles already done, {len(profiles)} to advise with concurrency {concurrency}")
+
+    async def run():
+        started = time.monotonic()
+        finished = failed = 0
+        with open(output, "a", encoding="utf-8") as out:
+            async for result in advise_profiles(profiles, concurrency):
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                finished += 1
+                failed += "error" in result
+                elapsed = time.monotonic() - started
+                print(f"[{finished}/{len(profiles)}] {result['id']}: "
+                      f"{'error' if 'error' in result else 'ok'} in {result['seconds']:.1f}s "
+                      f"({finished / elapsed * 60:.1f} profiles/min)")
+        print(f"Done: {finished - failed} advised, {failed} failed")
+
+    asyncio.run(run())
+
+
+if not modal.is_local():
+    if MEMORY_SNAPSHOT:
+        # The snapshot is taken once the module has loaded, so import
+        # everything now and restored containers start with it in memory
+        for name in DEFERRED_IMPORTS:
+            lazy_import(name)
+    report_cold_start()